@@ -1,15 +1,21 @@
 # /app/api/routes.py
 from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi.responses import FileResponse
 from typing import List
 import json
 import logging
 import asyncio
 from datetime import datetime
 from pathlib import Path
-from app.core.models import SessionConfig
-from app.services.imu_service import IMUManager
-from app.services.camera_service import CameraService
-from bleak import BleakScanner
+from app.core.config import settings
+from app.core.lazy import import_times
+from app.core.models import CameraConfig, ExportRequest, SessionConfig
+from app.services.device_pool import DevicePool
+from app.services.export_service import DatasetExporter, select_sessions
+from app.services.imu_service import bleak
+from app.services.offload_service import OffloadService, make_target
+from app.services.session_service import SessionManager
+from app.services.summary_service import SessionSummariser
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,8 +25,71 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Create service instances
-imu_manager = IMUManager()
-camera_service = CameraService()
+device_pool = DevicePool()
+session_manager = SessionManager(device_pool)
+def build_offload_target():
+    if not settings.OFFLOAD_TARGET:
+        return None
+    try:
+        return make_target(settings.OFFLOAD_TARGET, settings.OFFLOAD_CHUNK_MB * 1024 * 1024)
+    except ValueError as e:
+        logger.error(f"Offload disabled: {e}")
+        return None
+
+offload_service = OffloadService(
+    build_offload_target(),
+    settings.DATA_DIR / "offload",
+    is_busy=lambda: session_manager.is_recording,
+    rate_limit_mbps=settings.OFFLOAD_RATE_LIMIT_MBPS,
+    delete_after_transfer=settings.OFFLOAD_DELETE_AFTER_TRANSFER
+)
+
+# Post-session and warm-up tasks, kept referenced until done and awaited at shutdown
+background_tasks = set()
+
+def run_in_background(coro):
+    """Start a task that cannot be garbage-collected mid-run"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def finish_session(session_path):
+    """Post-session work: build the timeline summary, then queue offload"""
+    loop = asyncio.get_running_loop()
+    if settings.SUMMARY_AUTO_BUILD:
+        try:
+            await loop.run_in_executor(None, SessionSummariser(session_path).build)
+        except Exception as e:
+            logger.error(f"Error building summary for {session_path}: {e}")
+    # Offload only after the summary so it travels with the session
+    if offload_service.enabled and settings.OFFLOAD_AUTO_ENQUEUE:
+        offload_service.enqueue(session_path)
+
+session_manager.stop_listeners.append(
+    lambda session: run_in_background(finish_session(session.session_path))
+)
+
+# Dataset exports started through the API, by output name
+exports = {}
+
+# Filled in by app.main at startup
+startup_timings = {}
+
+async def warm_device_pool():
+    """Pre-open devices in the background so the web UI is not held up"""
+    loop = asyncio.get_running_loop()
+    try:
+        if settings.WARM_CAMERA:
+            camera = CameraConfig.from_streams({"rgb": True, "depth": True},
+                                               settings.WARM_CAMERA_SERIAL or None)
+            await loop.run_in_executor(None, device_pool.warm_camera, camera)
+        if settings.WARM_IMUS:
+            with open('IMU_designate.json', 'r') as f:
+                imu_configs = json.load(f)['imu_configs']
+            await device_pool.warm_imus([c['address'] for c in imu_configs.values()])
+    except Exception as e:
+        logger.error(f"Error warming device pool: {e}")
 
 @router.get("/imu-config")
 async def get_imu_config():
@@ -43,7 +112,7 @@ async def scan_imus():
                               for imu_id, config in imu_configs.items()}
         
         # Scan for devices
-        devices = await BleakScanner.discover(timeout=5.0)
+        devices = await bleak.BleakScanner.discover(timeout=5.0)
         found_addresses = {d.address: {
             "name": d.name,
             "rssi": d.rssi
@@ -83,54 +152,228 @@ async def create_session(config: SessionConfig):
         logger.error(f"Error creating session: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/offload")
+async def get_offload_status():
+    """Offload queue and per-session transfer progress"""
+    return offload_service.status()
+
+@router.post("/offload/pause")
+async def pause_offload():
+    offload_service.pause()
+    return offload_service.status()
+
+@router.post("/offload/resume")
+async def resume_offload():
+    offload_service.resume()
+    return offload_service.status()
+
+def child_path(root: Path, name: str):
+    """`root / name`, refusing names that are not a single plain path component"""
+    if name in ("", ".", "..") or Path(name).name != name:
+        raise HTTPException(status_code=400, detail=f"Invalid name: {name!r}")
+    return root / name
+
+@router.post("/offload/{session_name}")
+async def enqueue_offload(session_name: str):
+    if not offload_service.enabled:
+        raise HTTPException(status_code=503, detail="Offload target not configured")
+    session_path = child_path(settings.SESSIONS_DIR, session_name)
+    active = session_manager.get(session_name)
+    if active and active.is_recording:
+        raise HTTPException(status_code=409, detail=f"Session {session_name} is still recording")
+    try:
+        return offload_service.enqueue(session_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+def get_summariser(session_name: str):
+    try:
+        summariser = SessionSummariser(child_path(settings.SESSIONS_DIR, session_name))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Session {session_name} not found")
+    if not summariser.exists:
+        raise HTTPException(status_code=404, detail=f"No summary built for session {session_name}")
+    return summariser
+
+@router.post("/sessions/{session_name}/summary")
+async def build_summary(session_name: str):
+    """Build (or rebuild) the timeline summary of a recorded session"""
+    active = session_manager.get(session_name)
+    if active and active.is_recording:
+        raise HTTPException(status_code=409, detail=f"Session {session_name} is still recording")
+    try:
+        summariser = SessionSummariser(child_path(settings.SESSIONS_DIR, session_name))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Session {session_name} not found")
+    return await asyncio.get_running_loop().run_in_executor(None, summariser.build)
+
+@router.get("/sessions/{session_name}/summary")
+async def get_summary(session_name: str):
+    with open(get_summariser(session_name).index_path, "r") as f:
+        return json.load(f)
+
+@router.get("/sessions/{session_name}/summary/imu/{imu_id}")
+async def get_imu_summary(session_name: str, imu_id: str, start: float = None,
+                          end: float = None, width: int = 1000):
+    """IMU min/max/mean at the level matching the window and pixel width"""
+    summariser = get_summariser(session_name)
+    if imu_id not in summariser.reader.imu_files:
+        raise HTTPException(status_code=404, detail=f"IMU {imu_id} not in session")
+    width = max(1, min(width, 10000))
+    return summariser.query_imu(imu_id, start, end, width)
+
+@router.get("/sessions/{session_name}/summary/depth")
+async def get_depth_summary(session_name: str, start: float = None,
+                            end: float = None, width: int = 1000):
+    summariser = get_summariser(session_name)
+    if not (summariser.summary_path / "depth_coverage.npz").exists():
+        raise HTTPException(status_code=404, detail="Session has no depth data")
+    return summariser.query_depth_coverage(start, end, max(1, min(width, 10000)))
+
+@router.get("/sessions/{session_name}/summary/thumbnails.jpg")
+async def get_thumbnails(session_name: str):
+    path = get_summariser(session_name).summary_path / "thumbnails.jpg"
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Session has no RGB data")
+    return FileResponse(path)
+
+async def run_export(exporter, sessions):
+    """Run an export once no recording is active, logging any failure"""
+    # The worker processes would compete with live capture threads, so
+    # like offload the export waits for recordings to finish
+    exporter.progress = {"total": len(sessions), "done": 0, "running": True}
+    while session_manager.is_recording:
+        exporter.progress["waiting_for_recording"] = True
+        await asyncio.sleep(1.0)
+    exporter.progress.pop("waiting_for_recording", None)
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, exporter.export, sessions)
+    except Exception as e:
+        logger.error(f"Export to {exporter.output_dir} failed: {e}")
+        exporter.progress["error"] = str(e)
+        exporter.progress["running"] = False
+
+@router.post("/exports")
+async def start_export(request: ExportRequest):
+    """Export sessions as training shards in the background"""
+    output_dir = child_path(settings.EXPORTS_DIR, request.output_name)
+    running = exports.get(request.output_name)
+    if running and running.progress["running"]:
+        raise HTTPException(status_code=409, detail=f"Export {request.output_name} is already running")
+    try:
+        exporter = DatasetExporter(output_dir, request.spec)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Sessions still recording are left for a later incremental export
+    recording = {s.session_id for s in session_manager.active_sessions}
+    sessions = [p for p in select_sessions(settings.SESSIONS_DIR, request.sessions, request.participant_ids)
+                if p.name not in recording]
+    exports[request.output_name] = exporter
+    run_in_background(run_export(exporter, sessions))
+    return {"status": "started", "sessions": [p.name for p in sessions]}
+
+@router.get("/exports/{output_name}")
+async def get_export(output_name: str):
+    output_dir = child_path(settings.EXPORTS_DIR, output_name)
+    exporter = exports.get(output_name)
+    if exporter is None:
+        try:
+            exporter = DatasetExporter(output_dir)
+        except ValueError:
+            # Exported with a non-default spec; the manifest is still readable
+            with open(output_dir / "manifest.json", "r") as f:
+                manifest = json.load(f)
+            return {"progress": None, "sessions": list(manifest["sessions"]),
+                    "shards": len(manifest["shards"]), "spec": manifest["spec"]}
+        if not exporter.manifest_path.exists():
+            raise HTTPException(status_code=404, detail=f"Export {output_name} not found")
+    return {
+        "progress": exporter.progress,
+        "sessions": list(exporter.manifest["sessions"]),
+        "shards": len(exporter.manifest["shards"]),
+        "spec": exporter.manifest["spec"],
+    }
+
+@router.get("/metrics/startup")
+async def get_startup_metrics():
+    """Server start-up, device SDK import and warm device timings"""
+    return {
+        "startup": startup_timings,
+        "imports": import_times,
+        "device_pool": device_pool.status(),
+    }
+
+@router.get("/recordings")
+async def list_recordings():
+    """List recording sessions known to this server"""
+    return session_manager.list_sessions()
+
+@router.post("/recordings/{session_id}/stop")
+async def stop_recording_session(session_id: str):
+    try:
+        session = await session_manager.stop_session(session_id)
+        return {"status": "success", "session": session.info()}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+
 # In routes.py, add more detailed logging
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     logger.info("WebSocket connection established")
     
+    # Sessions started or watched by this connection
+    started_sessions = []
+    subscribed_sessions = []
+    
+    async def send_status(status):
+        await websocket.send_json(status)
+    
     try:
         while True:
             data = await websocket.receive_json()
-            logger.info(f"Received WebSocket message: {data}")  # This shows no camera_streams in the data
+            logger.info(f"Received WebSocket message: {data}")
             
             if data["action"] == "start_recording":
                 try:
                     session_path = data.get("session_path", "data/sessions/test")
                     selected_imus = data.get("selected_imus", [])
-                    camera_streams = data.get("camera_streams", {})  # This is empty
+                    if "cameras" in data:
+                        cameras = [CameraConfig(**camera) for camera in data["cameras"]]
+                    else:
+                        cameras = [CameraConfig.from_streams(data.get("camera_streams", {}),
+                                                             data.get("camera_serial"))]
                     
-                    logger.info(f"Camera streams config: {camera_streams}")  # Add this log
+                    logger.info(f"Camera config: {[c.dict() for c in cameras]}")
                     
-                    # Initialize camera if streams are enabled
-                    if camera_streams["rgb"] or camera_streams["depth"]:
-                        camera_success = await camera_service.initialize(
-                            session_path=session_path,
-                            enable_rgb=camera_streams["rgb"],
-                            enable_depth=camera_streams["depth"]
-                        )
-                        if camera_success:
-                            # Set up camera status callback
-                            camera_service.set_status_callback(
-                                lambda status: websocket.send_json(status)
-                            )
-                            # Start camera recording
-                            asyncio.create_task(camera_service.start_recording())
-                    
-                    # Load IMU configurations and start IMU recording
+                    # Load IMU configurations
                     with open('IMU_designate.json', 'r') as f:
                         imu_configs = json.load(f)['imu_configs']
                     
-                    imu_success = await imu_manager.start_recording(
+                    session, admission, result = await session_manager.start_session(
+                        session_path,
                         selected_imus,
                         imu_configs,
-                        session_path
+                        cameras,
+                        use_process=data.get("worker_process"),
+                        status_callback=send_status
                     )
+                    if session:
+                        started_sessions.append(session)
+                        subscribed_sessions.append(session)
+                    
+                    if admission["decision"] != "accept":
+                        await websocket.send_json({
+                            "type": "resource_status",
+                            "decision": admission["decision"],
+                            "reasons": admission["reasons"]
+                        })
                     
                     await websocket.send_json({
                         "type": "recording_status",
-                        "success": imu_success,
-                        "message": "Recording started" if imu_success else "Failed to start recording"
+                        "session_id": session.session_id if session else None,
+                        **result
                     })
                     
                 except Exception as e:
@@ -143,19 +386,73 @@ async def websocket_endpoint(websocket: WebSocket):
                     
             elif data["action"] == "stop_recording":
                 logger.info("Stopping recording")
-                # Stop IMU recording
-                await imu_manager.stop_recording()
-                # Stop camera recording if it was started
-                if camera_service.is_recording:
-                    await camera_service.stop_recording()
+                # Stop the named session, or every session this client started
+                session_id = data.get("session_id")
+                try:
+                    if session_id:
+                        stopped = [await session_manager.stop_session(session_id)]
+                    else:
+                        stopped = [s for s in started_sessions if s.is_recording]
+                        for session in stopped:
+                            await session_manager.stop_session(session.session_id)
+                    
+                    await websocket.send_json({
+                        "type": "recording_status",
+                        "success": True,
+                        "session_ids": [s.session_id for s in stopped],
+                        "message": "Recording stopped"
+                    })
+                except KeyError:
+                    await websocket.send_json({
+                        "type": "recording_status",
+                        "success": False,
+                        "message": f"Session {session_id} not found"
+                    })
+                
+            elif data["action"] == "start_replay":
+                # Stream a recorded session through the live status path
+                try:
+                    session, result = await session_manager.start_replay(
+                        child_path(settings.SESSIONS_DIR, data["session_name"]),
+                        speed=float(data.get("speed", 1.0)),
+                        status_callback=send_status
+                    )
+                    started_sessions.append(session)
+                    subscribed_sessions.append(session)
+                    await websocket.send_json({
+                        "type": "replay_status",
+                        "session_id": session.session_id,
+                        **result
+                    })
+                except Exception as e:
+                    logger.error(f"Error starting replay: {e}")
+                    await websocket.send_json({
+                        "type": "replay_status",
+                        "success": False,
+                        "message": f"Error: {str(e)}"
+                    })
+                
+            elif data["action"] == "subscribe":
+                # Attach this connection to another session's status channel
+                session = session_manager.get(data.get("session_id"))
+                if session:
+                    session.subscribe(send_status)
+                    subscribed_sessions.append(session)
+                await websocket.send_json({
+                    "type": "subscription_status",
+                    "session_id": data.get("session_id"),
+                    "success": session is not None
+                })
                 
+            elif data["action"] == "list_sessions":
                 await websocket.send_json({
-                    "type": "recording_status",
-                    "success": True,
-                    "message": "Recording stopped"
+                    "type": "session_list",
+                    "sessions": session_manager.list_sessions()
                 })
                 
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     finally:
+        for session in subscribed_sessions:
+            session.unsubscribe(send_status)
         logger.info("WebSocket connection closed")
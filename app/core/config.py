@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import List
 
 class Settings(BaseSettings):
     # Project paths
@@ -17,6 +18,50 @@ class Settings(BaseSettings):
     CONTROL_UUID: str = "15172001-4947-11e9-8646-d663bd873d93"
     SAMPLING_RATE: int = 60
     
+    # Resource governor settings
+    STORAGE_WRITE_BUDGET_MBPS: float = 40.0
+    CPU_BUDGET_CORES: float = 4.0
+    RESOURCE_WARN_FRACTION: float = 0.8
+    MAX_SESSION_DURATION_S: int = 7200  # Warn if free disk cannot hold this long
+    MIN_SESSION_DURATION_S: int = 600  # Reject if free disk cannot hold this long
+    WRITE_LATENCY_BUDGET: float = 0.8  # Fraction of the frame period
+    MAX_DROPPED_FRAMES: int = 3  # Per 30-frame window
+    DEGRADATION_POLICY: List[str] = ["drop_ir", "decimate_depth_2", "decimate_depth_4"]
+    
+    # Session settings
+    SESSION_WORKER_PROCESSES: bool = False  # Run each session in its own process
+    
+    # Device settings
+    CAMERA_BACKEND: str = "realsense"  # "realsense" or "fake"
+    WARM_CAMERA: bool = False  # Keep the camera streaming between sessions
+    WARM_CAMERA_SERIAL: str = ""
+    WARM_IMUS: bool = False  # Keep BLE links to configured IMUs open
+    FAKE_CAMERA_COUNT: int = 1  # Cameras emulated by CAMERA_BACKEND=fake
+    
+    # Replay settings
+    REPLAY_PREFETCH_EVENTS: int = 512
+    REPLAY_DECODE_WORKERS: int = 4
+    
+    # Offload settings
+    OFFLOAD_TARGET: str = ""  # Directory (e.g. NAS mount) or s3://bucket/prefix, empty disables
+    OFFLOAD_S3_ENDPOINT: str = ""  # For S3-compatible stores other than AWS
+    OFFLOAD_RATE_LIMIT_MBPS: float = 10.0
+    OFFLOAD_CHUNK_MB: int = 8
+    OFFLOAD_AUTO_ENQUEUE: bool = True  # Queue sessions when they stop recording
+    OFFLOAD_DELETE_AFTER_TRANSFER: bool = False
+    
+    # Session summary settings
+    SUMMARY_AUTO_BUILD: bool = True  # Build when a recording stops
+    SUMMARY_BASE_BUCKET: int = 4  # IMU samples per bucket at the finest level
+    SUMMARY_LEVEL_FACTOR: int = 4  # Buckets merged per coarser level
+    SUMMARY_THUMB_INTERVAL_S: float = 10.0
+    SUMMARY_THUMB_WIDTH: int = 128
+    SUMMARY_DEPTH_INTERVAL_S: float = 1.0
+    
+    # Dataset export settings
+    EXPORTS_DIR: Path = DATA_DIR / "exports"
+    EXPORT_WORKERS: int = 0  # 0 uses one process per CPU
+    
     class Config:
         env_file = ".env"
 
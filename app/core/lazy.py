@@ -0,0 +1,31 @@
+import importlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds spent importing each lazily loaded module
+import_times = {}
+
+
+class LazyModule:
+    """Module proxy that defers the import until an attribute is first used.
+
+    Keeps heavy device SDKs (pyrealsense2, cv2, bleak) off the server's
+    startup path, and lets the web UI come up on hosts without them.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            start = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            import_times[self._name] = time.perf_counter() - start
+            logger.info(f"Imported {self._name} in {import_times[self._name]:.3f}s")
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, field_validator
+from pathlib import PurePath
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 class SessionConfig(BaseModel):
@@ -8,3 +9,53 @@ class SessionConfig(BaseModel):
     participant_id: str
     selected_imus: List[str]
     timestamp: datetime = None
+
+class ExportRequest(BaseModel):
+    output_name: str
+    sessions: List[str] = []  # Empty selects every session
+    participant_ids: List[str] = []
+    spec: Dict[str, Any] = {}  # Overrides of the default window/shard spec
+
+class StreamConfig(BaseModel):
+    width: int = 640
+    height: int = 480
+    fps: int = 30
+    format: Optional[str] = None  # Stream default (bgr8 / z16) when unset
+
+class CameraConfig(BaseModel):
+    name: str = "main"  # The main camera records into the session root
+    serial: Optional[str] = None  # None picks the first available camera
+    rgb: Optional[StreamConfig] = None
+    depth: Optional[StreamConfig] = None  # Both IR planes share the depth profile
+    sync_mode: int = 0  # inter_cam_sync_mode: 0 default, 1 master, 2 slave
+
+    @field_validator("name")
+    @classmethod
+    def check_name(cls, name: str):
+        # Non-main cameras record into cameras/<name> of the session
+        if name in ("", ".", "..") or PurePath(name).name != name or "\\" in name:
+            raise ValueError(f"Camera name must be a single path component: {name!r}")
+        return name
+
+    @field_validator("rgb")
+    @classmethod
+    def check_rgb_format(cls, rgb: Optional[StreamConfig]):
+        if rgb and rgb.format not in (None, "bgr8", "rgb8"):
+            raise ValueError(f"Unsupported RGB format {rgb.format!r}, use bgr8 or rgb8")
+        return rgb
+
+    @field_validator("depth")
+    @classmethod
+    def check_depth_format(cls, depth: Optional[StreamConfig]):
+        if depth and depth.format not in (None, "z16"):
+            raise ValueError(f"Unsupported depth format {depth.format!r}, use z16")
+        return depth
+
+    @classmethod
+    def from_streams(cls, camera_streams: dict, serial: str = None):
+        """Single 640x480@30 camera from the legacy {"rgb", "depth"} flags"""
+        return cls(
+            serial=serial,
+            rgb=StreamConfig() if camera_streams.get("rgb") else None,
+            depth=StreamConfig() if camera_streams.get("depth") else None
+        )
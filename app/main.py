@@ -1,9 +1,15 @@
 # app/main.py
+import time
+APP_IMPORT_START = time.perf_counter()
+
+import asyncio
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
+from app.api import routes
+from app.core.config import settings
 from app.api.routes import router
 
 # Create FastAPI app
@@ -27,6 +33,25 @@ app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
 # Include API routes
 app.include_router(router, prefix="/api")
 
+@app.on_event("startup")
+async def startup():
+    routes.startup_timings["app_ready_s"] = time.perf_counter() - APP_IMPORT_START
+    # Devices warm up in the background; the UI is served immediately
+    routes.run_in_background(routes.warm_device_pool())
+    # Nothing is recording yet, so every session on disk is complete
+    if routes.offload_service.enabled and settings.OFFLOAD_AUTO_ENQUEUE:
+        routes.offload_service.enqueue_pending(settings.SESSIONS_DIR)
+    routes.offload_service.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await routes.session_manager.stop_all()
+    # Let device warm-up and summaries of the sessions just stopped finish
+    # before offload and the device pool shut down
+    await asyncio.gather(*routes.background_tasks, return_exceptions=True)
+    await routes.offload_service.stop()
+    await routes.device_pool.close()
+
 # Root endpoint to serve index.html
 @app.get("/")
 async def read_root():
@@ -1,180 +1,363 @@
-import pyrealsense2 as rs
 import numpy as np
-import cv2
 import logging
 from pathlib import Path
 import json
 from datetime import datetime
 import asyncio
+import threading
+import time
+from app.core.config import settings
+from app.core.lazy import LazyModule
+from app.core.models import CameraConfig
 
 logger = logging.getLogger(__name__)
 
+# Device SDKs are imported on first use so the server starts without them
+CAMERA_BACKENDS = {
+    "realsense": "pyrealsense2",
+    "fake": "app.services.fake_camera",
+}
+rs = LazyModule(CAMERA_BACKENDS[settings.CAMERA_BACKEND])
+cv2 = LazyModule("cv2")
+
 class CameraService:
-    def __init__(self):
+    """Records one RealSense camera, selected by serial number.
+
+    Capture runs on a worker thread per camera, so several cameras wait on
+    frames and write in parallel without holding up the event loop; status
+    messages are handed back to the loop. The "main" camera writes into
+    the session directory itself, every other camera into
+    `cameras/<name>/` with the same layout.
+    """
+
+    def __init__(self, camera_config: CameraConfig = None, device_pool=None):
+        self.camera_config = camera_config or CameraConfig()
+        self.name = self.camera_config.name
+        self.serial = self.camera_config.serial
+        self.device_pool = device_pool
         self.pipeline = None
         self.config = None
         self.is_recording = False
         self.frame_count = 0
         self.start_time = None
         self.session_path = None
-        self.enabled_streams = {"rgb": False, "depth": False}
+        self.output_path = None
+        self.enabled_streams = {
+            "rgb": self.camera_config.rgb is not None,
+            "depth": self.camera_config.depth is not None
+        }
         self.record_status_callback = None
         self.rgb_writer = None
+        self.governor = None
+        self.dropped_frames = 0
+        self.depth_frames_saved = 0
+        self.write_time_s = 0.0
+        self.timings = {}
+        self._loop = None
+        self._thread = None
+        self._files = {}
+
+    @staticmethod
+    def build_config(camera_config: CameraConfig):
+        """Build the rs.config for the configured streams"""
+        config = rs.config()
+        if camera_config.serial:
+            # Bind to a specific camera when several are attached
+            config.enable_device(camera_config.serial)
+        rgb = camera_config.rgb
+        if rgb:
+            config.enable_stream(rs.stream.color, rgb.width, rgb.height,
+                                 getattr(rs.format, rgb.format or "bgr8"), rgb.fps)
+        depth = camera_config.depth
+        if depth:
+            # Both infrared streams come off the depth sensor at its resolution
+            config.enable_stream(rs.stream.infrared, 1, depth.width, depth.height, rs.format.y8, depth.fps)  # Left IR
+            config.enable_stream(rs.stream.infrared, 2, depth.width, depth.height, rs.format.y8, depth.fps)  # Right IR
+            config.enable_stream(rs.stream.depth, depth.width, depth.height,
+                                 getattr(rs.format, depth.format or "z16"), depth.fps)
+        return config
 
-    async def initialize(self, session_path: Path, enable_rgb: bool = False, enable_depth: bool = False):
-        """Initialize camera with specified streams"""
+    @staticmethod
+    def configure_device(camera_config: CameraConfig):
+        """Apply the inter-camera sync mode before streaming starts.
+
+        Global time is enabled alongside so frame timestamps from several
+        cameras share the host clock. Only cameras selected by serial can
+        be configured, since the default device is not known in advance.
+        """
+        if not camera_config.serial:
+            if camera_config.sync_mode:
+                logger.warning(f"Camera {camera_config.name}: sync mode needs a serial number, ignored")
+            return
+        for device in rs.context().query_devices():
+            if device.get_info(rs.camera_info.serial_number) != camera_config.serial:
+                continue
+            sensor = device.first_depth_sensor()
+            if sensor.supports(rs.option.global_time_enabled):
+                sensor.set_option(rs.option.global_time_enabled, 1)
+            if sensor.supports(rs.option.inter_cam_sync_mode):
+                sensor.set_option(rs.option.inter_cam_sync_mode, camera_config.sync_mode)
+            elif camera_config.sync_mode:
+                logger.warning(f"Camera {camera_config.serial} does not support inter-camera sync")
+            return
+        raise RuntimeError(f"Camera {camera_config.serial} not found")
+
+    def _start_pipeline(self):
+        self.configure_device(self.camera_config)
+        self.pipeline = rs.pipeline()
+        self.config = self.build_config(self.camera_config)
+        self.pipeline.start(self.config)
+
+    async def initialize(self, session_path: Path, governor=None):
+        """Initialize camera with the configured streams"""
         try:
             self.session_path = Path(session_path)
-            self.enabled_streams = {"rgb": enable_rgb, "depth": enable_depth}
-            
+            self.output_path = self.session_path
+            if self.name != "main":
+                self.output_path = self.session_path / "cameras" / self.name
+                self.output_path.mkdir(parents=True, exist_ok=True)
+            self.governor = governor
+            enable_rgb = self.enabled_streams["rgb"]
+            enable_depth = self.enabled_streams["depth"]
+
             if not (enable_rgb or enable_depth):
-                logger.info("No streams enabled, camera initialization skipped")
+                logger.info(f"Camera {self.name}: no streams enabled, initialization skipped")
                 return True
 
-            self.pipeline = rs.pipeline()
-            self.config = rs.config()
+            init_start = time.perf_counter()
+            if self.device_pool:
+                self.pipeline = self.device_pool.acquire_camera(self.camera_config)
+            self.timings = {"warm_start": self.pipeline is not None}
 
-            # Configure streams
             if enable_rgb:
-                self.config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
                 # Initialize video writer for RGB stream
+                rgb = self.camera_config.rgb
                 self.rgb_writer = cv2.VideoWriter(
-                    str(self.session_path / "rgb_stream.mp4"),
+                    str(self.output_path / "rgb_stream.mp4"),
                     cv2.VideoWriter_fourcc(*'mp4v'),
-                    30,  # FPS
-                    (640, 480)  # Resolution
+                    rgb.fps,
+                    (rgb.width, rgb.height)
                 )
-                logger.info("RGB stream enabled")
+                logger.info(f"Camera {self.name}: RGB stream enabled")
 
             if enable_depth:
-                # Enable both infrared streams and depth
-                self.config.enable_stream(rs.stream.infrared, 1, 640, 480, rs.format.y8, 30)  # Left IR
-                self.config.enable_stream(rs.stream.infrared, 2, 640, 480, rs.format.y8, 30)  # Right IR
-                self.config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
                 # Create depth directory
-                (self.session_path / "depth").mkdir(exist_ok=True)
-                logger.info("Depth stream enabled")
+                (self.output_path / "depth").mkdir(exist_ok=True)
+                logger.info(f"Camera {self.name}: depth stream enabled")
+
+            if self.pipeline is None:
+                # Cold start: enumerate the device and start streaming, off the
+                # event loop so several cameras start up concurrently
+                await asyncio.get_running_loop().run_in_executor(None, self._start_pipeline)
+            self.timings["initialize_s"] = time.perf_counter() - init_start
+            logger.info(f"Camera {self.name} ({self.serial or 'default'}) initialized with "
+                        f"RGB: {enable_rgb}, Depth: {enable_depth}")
 
-            # Start streaming
-            self.pipeline.start(self.config)
-            logger.info(f"Camera initialized with RGB: {enable_rgb}, Depth: {enable_depth}")
-            
             # Save camera configuration
             config_data = {
+                "name": self.name,
+                "serial": self.serial,
                 "enabled_streams": self.enabled_streams,
-                "resolution": "640x480",
-                "fps": 30,
-                "initialization_time": datetime.now().isoformat()
+                "rgb": self.camera_config.rgb.dict() if enable_rgb else None,
+                "depth": self.camera_config.depth.dict() if enable_depth else None,
+                "sync_mode": self.camera_config.sync_mode,
+                "initialization_time": datetime.now().isoformat(),
+                "warm_start": self.timings["warm_start"],
+                "initialize_s": self.timings["initialize_s"]
             }
-            with open(self.session_path / "camera_config.json", "w") as f:
+            with open(self.output_path / "camera_config.json", "w") as f:
                 json.dump(config_data, f, indent=4)
-            
+
             return True
 
         except Exception as e:
-            logger.error(f"Camera initialization error: {e}")
+            logger.error(f"Camera {self.name} initialization error: {e}")
             return False
 
     async def start_recording(self):
-        """Start recording enabled streams"""
+        """Start the capture worker for the enabled streams"""
         if not (self.enabled_streams["rgb"] or self.enabled_streams["depth"]):
             return False
 
         self.is_recording = True
         self.start_time = datetime.now()
         self.frame_count = 0
+        self.dropped_frames = 0
+        self.depth_frames_saved = 0
+        self.write_time_s = 0.0
+        self._loop = asyncio.get_running_loop()
 
-        # Create timestamp files
+        # Create timestamp files, kept open for the whole recording
         if self.enabled_streams["rgb"]:
-            with open(self.session_path / "rgb_timestamps.txt", "w") as f:
-                f.write("frame_number,timestamp\n")
+            self._files["rgb"] = open(self.output_path / "rgb_timestamps.txt", "w")
+            self._files["rgb"].write("frame_number,timestamp\n")
         if self.enabled_streams["depth"]:
-            with open(self.session_path / "depth_timestamps.txt", "w") as f:
-                f.write("frame_number,timestamp\n")
-        
+            self._files["depth"] = open(self.output_path / "depth_timestamps.txt", "w")
+            self._files["depth"].write("frame_number,timestamp\n")
+        # Device-side timing of every frame, for aligning cameras afterwards
+        self._files["metadata"] = open(self.output_path / "frame_metadata.csv", "w")
+        self._files["metadata"].write(
+            "frame_number,host_timestamp,stream,hw_frame_number,hw_timestamp_ms,timestamp_domain,sensor_timestamp_us\n"
+        )
+
+        self._thread = threading.Thread(
+            target=self._capture_loop, name=f"camera-{self.name}", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def _send_status(self, status: dict):
+        """Hand a status message from the capture thread to the event loop"""
+        if self.record_status_callback and self._loop:
+            status = {**status, "camera": self.name, "serial": self.serial}
+            asyncio.run_coroutine_threadsafe(self.record_status_callback(status), self._loop)
+
+    def _write_metadata(self, frame, stream: str, timestamp: float):
+        sensor_timestamp = ""
+        if frame.supports_frame_metadata(rs.frame_metadata_value.sensor_timestamp):
+            sensor_timestamp = frame.get_frame_metadata(rs.frame_metadata_value.sensor_timestamp)
+        domain = str(frame.get_frame_timestamp_domain()).rsplit(".", 1)[-1]
+        self._files["metadata"].write(
+            f"{self.frame_count},{timestamp:.6f},{stream},{frame.get_frame_number()},"
+            f"{frame.get_timestamp():.3f},{domain},{sensor_timestamp}\n"
+        )
+
+    def _capture_loop(self):
+        """Blocking capture and write loop, runs on the camera's own thread"""
+        record_start = time.perf_counter()
+        last_frame_number = None
+        convert_rgb = self.enabled_streams["rgb"] and self.camera_config.rgb.format == "rgb8"
+
         while self.is_recording:
             try:
                 frames = self.pipeline.wait_for_frames()
-                timestamp = datetime.now()
-                
+                timestamp = datetime.now().timestamp()
+                write_start = time.monotonic()
+
+                # Gaps in the hardware frame number mean we fell behind
+                frame_number = frames.get_frame_number()
+                dropped = 0
+                if last_frame_number is not None and frame_number > last_frame_number + 1:
+                    dropped = frame_number - last_frame_number - 1
+                    self.dropped_frames += dropped
+                last_frame_number = frame_number
+                if self.frame_count == 0:
+                    self.timings["first_frame_s"] = time.perf_counter() - record_start
+                    logger.info(f"Camera {self.name}: first frame after {self.timings['first_frame_s']:.3f}s")
+
                 if self.enabled_streams["rgb"]:
                     color_frame = frames.get_color_frame()
                     if color_frame:
                         color_image = np.asanyarray(color_frame.get_data())
+                        if convert_rgb:
+                            color_image = cv2.cvtColor(color_image, cv2.COLOR_RGB2BGR)
                         self.rgb_writer.write(color_image)
-                        
+
                         # Save timestamp
-                        with open(self.session_path / "rgb_timestamps.txt", "a") as f:
-                            f.write(f"{self.frame_count},{timestamp.timestamp():.6f}\n")
+                        self._files["rgb"].write(f"{self.frame_count},{timestamp:.6f}\n")
+                        self._write_metadata(color_frame, "rgb", timestamp)
 
-                if self.enabled_streams["depth"]:
+                save_ir = self.governor.save_ir if self.governor else True
+                keep_depth = self.governor.keep_depth_frame(self.frame_count) if self.governor else True
+
+                if self.enabled_streams["depth"] and keep_depth:
                     # Get both IR frames and depth frame
                     ir1_frame = frames.get_infrared_frame(1)  # Left IR
                     ir2_frame = frames.get_infrared_frame(2)  # Right IR
                     depth_frame = frames.get_depth_frame()
 
-                    if depth_frame and ir1_frame and ir2_frame:
-                        # Save depth data
-                        depth_data = {
-                            "depth": np.asanyarray(depth_frame.get_data()),
-                            "ir_left": np.asanyarray(ir1_frame.get_data()),
-                            "ir_right": np.asanyarray(ir2_frame.get_data())
-                        }
+                    if depth_frame and (not save_ir or (ir1_frame and ir2_frame)):
+                        # Save depth data, IR planes are the first to go under pressure
+                        depth_data = {"depth": np.asanyarray(depth_frame.get_data())}
+                        if save_ir:
+                            depth_data["ir_left"] = np.asanyarray(ir1_frame.get_data())
+                            depth_data["ir_right"] = np.asanyarray(ir2_frame.get_data())
                         np.savez_compressed(
-                            str(self.session_path / "depth" / f"frame_{self.frame_count}_{timestamp.timestamp():.6f}.npz"),
+                            str(self.output_path / "depth" / f"frame_{self.frame_count}_{timestamp:.6f}.npz"),
                             **depth_data
                         )
-                        
+
                         # Save timestamp
-                        with open(self.session_path / "depth_timestamps.txt", "a") as f:
-                            f.write(f"{self.frame_count},{timestamp.timestamp():.6f}\n")
+                        self._files["depth"].write(f"{self.frame_count},{timestamp:.6f}\n")
+                        self._write_metadata(depth_frame, "depth", timestamp)
+                        self.depth_frames_saved += 1
+
+                write_time = time.monotonic() - write_start
+                self.write_time_s += write_time
+                if self.governor:
+                    degradation = self.governor.observe_write(write_time, dropped)
+                    if degradation:
+                        self._send_status({
+                            "type": "resource_status",
+                            "degradation": degradation
+                        })
 
                 self.frame_count += 1
-                
+
                 # Send status update every 30 frames
-                if self.frame_count % 30 == 0 and self.record_status_callback:
-                    await self.record_status_callback({
+                if self.frame_count % 30 == 0:
+                    for f in self._files.values():
+                        f.flush()
+                    self._send_status({
                         "type": "camera_status",
                         "frame_count": self.frame_count,
                         "streams": self.enabled_streams,
+                        "dropped_frames": self.dropped_frames,
                         "recording_time": (datetime.now() - self.start_time).total_seconds()
                     })
 
-                await asyncio.sleep(0.001)  # Small delay to prevent CPU overload
-
             except Exception as e:
-                logger.error(f"Error recording frame: {e}")
-                if self.record_status_callback:
-                    await self.record_status_callback({
-                        "type": "camera_status",
-                        "error": str(e)
-                    })
+                logger.error(f"Camera {self.name}: error recording frame: {e}")
+                self._send_status({
+                    "type": "camera_status",
+                    "error": str(e)
+                })
                 break
 
     async def stop_recording(self):
         """Stop recording and cleanup"""
         self.is_recording = False
-        
+        if self._thread:
+            # The worker exits after its current wait_for_frames returns
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+            self._thread = None
+
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
         # Release video writer if it exists
         if self.rgb_writer:
             self.rgb_writer.release()
-        
+
         if self.pipeline:
-            self.pipeline.stop()
-            
+            if self.device_pool:
+                # Keep the pipeline streaming for the next session
+                self.device_pool.release_camera(self.camera_config, self.pipeline)
+            else:
+                self.pipeline.stop()
+            self.pipeline = None
+
         # Save recording summary
         if self.start_time:
             summary = {
+                "name": self.name,
+                "serial": self.serial,
                 "total_frames": self.frame_count,
                 "start_time": self.start_time.isoformat(),
                 "end_time": datetime.now().isoformat(),
-                "enabled_streams": self.enabled_streams
+                "enabled_streams": self.enabled_streams,
+                "dropped_frames": self.dropped_frames,
+                "depth_frames_saved": self.depth_frames_saved,
+                "mean_write_ms": 1000 * self.write_time_s / self.frame_count if self.frame_count else None,
+                "degradations": self.governor.degradations if self.governor else [],
+                "timings": self.timings
             }
-            
-            with open(self.session_path / "camera_recording_summary.json", "w") as f:
+
+            with open(self.output_path / "camera_recording_summary.json", "w") as f:
                 json.dump(summary, f, indent=4)
 
-        logger.info(f"Camera recording stopped. Total frames: {self.frame_count}")
+        logger.info(f"Camera {self.name} recording stopped. Total frames: {self.frame_count}")
 
     def set_status_callback(self, callback):
         """Set callback for status updates"""
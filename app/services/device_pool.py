@@ -0,0 +1,129 @@
+# app/services/device_pool.py
+import asyncio
+import json
+import logging
+import time
+from app.services.camera_service import rs, CameraService
+from app.services.imu_service import bleak
+
+logger = logging.getLogger(__name__)
+
+
+class DevicePool:
+    """Keeps camera pipelines and BLE links open and idle between sessions.
+
+    A warm RealSense pipeline is keyed by serial number and stream
+    configuration, since a running pipeline cannot change its streams.
+    `start_recording` then only has to attach writers instead of paying
+    for USB enumeration and sensor start-up.
+    """
+
+    def __init__(self):
+        self.cameras = {}
+        self.imu_clients = {}
+        self.timings = {}
+
+    @staticmethod
+    def camera_key(camera_config):
+        # The camera's name only picks the output directory
+        return json.dumps(camera_config.dict(exclude={"name"}), sort_keys=True)
+
+    def warm_camera(self, camera_config):
+        """Start a pipeline now so a later session can take it over"""
+        key = self.camera_key(camera_config)
+        if key in self.cameras:
+            return self.cameras[key][1]
+
+        start = time.perf_counter()
+        serial = camera_config.serial or "default"
+        CameraService.configure_device(camera_config)
+        pipeline = rs.pipeline()
+        pipeline.start(CameraService.build_config(camera_config))
+        self.cameras[key] = (camera_config, pipeline)
+        self.timings[f"camera_warm_s:{serial}"] = time.perf_counter() - start
+        logger.info(f"Warmed camera {serial} in {time.perf_counter() - start:.3f}s")
+        return pipeline
+
+    def acquire_camera(self, camera_config):
+        """Take a running pipeline out of the pool, or None if none matches.
+
+        On a miss, pooled pipelines holding the same device with other
+        streams are stopped, so the caller's cold start can open it.
+        """
+        _, pipeline = self.cameras.pop(self.camera_key(camera_config), (None, None))
+        if pipeline:
+            # Discard frames queued while idle so the session starts on fresh ones
+            while pipeline.poll_for_frames():
+                pass
+        else:
+            self.evict_camera(camera_config.serial)
+        return pipeline
+
+    def evict_camera(self, serial):
+        """Stop pooled pipelines of one camera (serial None: the default device)"""
+        for key, (config, pipeline) in list(self.cameras.items()):
+            if config.serial == serial:
+                del self.cameras[key]
+                pipeline.stop()
+                logger.info(f"Evicted warm camera {serial or 'default'} for a different stream set")
+
+    def release_camera(self, camera_config, pipeline):
+        """Return a pipeline to the pool, leaving it streaming"""
+        key = self.camera_key(camera_config)
+        if key in self.cameras:
+            pipeline.stop()
+        else:
+            self.cameras[key] = (camera_config, pipeline)
+
+    async def warm_imus(self, addresses):
+        """Connect BLE links up front, one at a time like IMUManager does"""
+        for address in addresses:
+            if address in self.imu_clients:
+                continue
+            start = time.perf_counter()
+            try:
+                device = await bleak.BleakScanner.find_device_by_address(address, timeout=20.0)
+                if not device:
+                    logger.warning(f"Could not find IMU {address} to warm")
+                    continue
+                client = bleak.BleakClient(device)
+                await client.connect()
+                self.imu_clients[address] = client
+                self.timings[f"imu_warm_s:{address}"] = time.perf_counter() - start
+                logger.info(f"Warmed IMU {address} in {time.perf_counter() - start:.3f}s")
+            except Exception as e:
+                logger.error(f"Error warming IMU {address}: {e}")
+            await asyncio.sleep(2)  # Delay between device setups
+
+    def acquire_imu(self, address):
+        """Take a connected BLE client out of the pool, or None"""
+        client = self.imu_clients.pop(address, None)
+        if client and not client.is_connected:
+            return None
+        return client
+
+    async def release_imu(self, address, client):
+        """Return a BLE client to the pool, leaving the link up"""
+        if client.is_connected and address not in self.imu_clients:
+            self.imu_clients[address] = client
+        elif client.is_connected:
+            await client.disconnect()
+
+    async def close(self):
+        for _, pipeline in self.cameras.values():
+            pipeline.stop()
+        self.cameras.clear()
+        for client in self.imu_clients.values():
+            if client.is_connected:
+                await client.disconnect()
+        self.imu_clients.clear()
+
+    def status(self):
+        return {
+            "cameras": [
+                {"serial": config.serial, "rgb": config.rgb is not None, "depth": config.depth is not None}
+                for config, _ in self.cameras.values()
+            ],
+            "imus": list(self.imu_clients),
+            "timings": self.timings,
+        }
@@ -0,0 +1,488 @@
+# app/services/export_service.py
+import argparse
+import hashlib
+import importlib.util
+import io
+import json
+import logging
+import multiprocessing
+import shutil
+import tarfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+from app.core.config import settings
+from app.core.lazy import LazyModule
+from app.services.camera_service import cv2
+from app.services.session_reader import SessionReader
+
+logger = logging.getLogger(__name__)
+
+pyarrow = LazyModule("pyarrow")
+
+SHARD_FORMATS = ("npz", "tar", "arrow")
+
+DEFAULT_SPEC = {
+    "window_s": 2.0,
+    "stride_s": 1.0,
+    "frames_per_window": 1,
+    "imu_ids": [],  # Empty means every IMU in the session
+    "include_rgb": True,
+    "include_depth": True,
+    "include_ir": False,
+    "format": "tar",
+    "shard_max_mb": 256,
+    "shuffle_buffer": 256,
+    "seed": 0,
+}
+
+# Label fields copied from each session's config.json
+LABEL_FIELDS = ["participant_id", "researcher_id", "session_name"]
+
+
+def spec_hash(spec: dict):
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class ShardWriter:
+    """Writes samples into size-bounded shards named `<prefix>-<n>.<ext>`.
+
+    Samples are grouped by their fields and array shapes, so sessions
+    recorded with different streams or resolutions never have to be
+    stacked into one shard.
+    """
+
+    def __init__(self, output_dir: Path, prefix: str, fmt: str, max_bytes: float):
+        if fmt not in SHARD_FORMATS:
+            raise ValueError(f"Unknown shard format: {fmt}")
+        self.output_dir = Path(output_dir)
+        self.prefix = prefix
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.groups = {}
+        self.shards = []
+
+    @staticmethod
+    def _schema(sample: dict):
+        return tuple(sorted(
+            (key, value.shape, value.dtype.str) if isinstance(value, np.ndarray) else (key,)
+            for key, value in sample.items()
+        ))
+
+    def add(self, sample: dict):
+        group = self.groups.setdefault(self._schema(sample), {"samples": [], "bytes": 0})
+        group["samples"].append(sample)
+        group["bytes"] += sum(v.nbytes for v in sample.values() if isinstance(v, np.ndarray))
+        if group["bytes"] >= self.max_bytes:
+            self._flush_group(group)
+
+    def _flush_group(self, group: dict):
+        samples = group["samples"]
+        if not samples:
+            return
+        path = self.output_dir / f"{self.prefix}-{len(self.shards):05d}.{self.fmt}"
+        getattr(self, f"_write_{self.fmt}")(path, samples)
+        self.shards.append({
+            "file": path.name,
+            "samples": len(samples),
+            "bytes": path.stat().st_size,
+            "sessions": sorted({s["session_id"] for s in samples}),
+        })
+        group["samples"] = []
+        group["bytes"] = 0
+
+    def flush(self):
+        for group in self.groups.values():
+            self._flush_group(group)
+
+    def close(self):
+        self.flush()
+        return self.shards
+
+    def _write_npz(self, path: Path, samples: list):
+        # One stacked array per field, samples of a group share their shapes
+        arrays = {}
+        for key in samples[0]:
+            arrays[key] = np.stack([np.asarray(s[key]) for s in samples])
+        np.savez(path, **arrays)
+
+    def _write_tar(self, path: Path, samples: list):
+        # WebDataset layout: files of one sample share the `__key__` prefix
+        with tarfile.open(path, "w") as tar:
+            for sample in samples:
+                labels = {k: v for k, v in sample.items() if not isinstance(v, np.ndarray)}
+                files = {f"{sample['key']}.json": json.dumps(labels).encode()}
+                for key, value in sample.items():
+                    if isinstance(value, np.ndarray):
+                        buffer = io.BytesIO()
+                        np.save(buffer, value)
+                        files[f"{sample['key']}.{key}.npy"] = buffer.getvalue()
+                for name, data in files.items():
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    info.mtime = int(time.time())
+                    tar.addfile(info, io.BytesIO(data))
+
+    def _write_arrow(self, path: Path, samples: list):
+        # Arrays are stored as .npy bytes so their shape and dtype survive
+        columns = {}
+        for key, value in samples[0].items():
+            if isinstance(value, np.ndarray):
+                data = []
+                for sample in samples:
+                    buffer = io.BytesIO()
+                    np.save(buffer, sample[key])
+                    data.append(buffer.getvalue())
+                columns[key] = pyarrow.array(data, type=pyarrow.binary())
+            else:
+                columns[key] = pyarrow.array([s[key] for s in samples])
+        table = pyarrow.table(columns)
+        with pyarrow.OSFile(str(path), "wb") as sink:
+            with pyarrow.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+def read_staged(path: Path):
+    """Yield the samples of a tar written by ShardWriter, in order"""
+    with tarfile.open(path, "r") as tar:
+        sample, key = None, None
+        for member in tar:
+            data = tar.extractfile(member).read()
+            if member.name.endswith(".json"):
+                if sample is not None:
+                    yield sample
+                key = member.name[:-len(".json")]
+                sample = json.loads(data)
+            else:
+                field = member.name[len(key) + 1:-len(".npy")]
+                sample[field] = np.load(io.BytesIO(data))
+        if sample is not None:
+            yield sample
+
+
+def _nearest_frames(frame_times, targets, tolerance):
+    """Index of the nearest frame for each target time, -1 if none is close"""
+    idx = np.clip(np.searchsorted(frame_times, targets), 1, len(frame_times) - 1)
+    left_closer = targets - frame_times[idx - 1] < frame_times[idx] - targets
+    idx = idx - left_closer
+    idx[np.abs(frame_times[idx] - targets) > tolerance] = -1
+    return idx
+
+
+def export_session(session_path: str, staging_dir: str, spec: dict):
+    """Turn one session into shuffled samples, reading every raw file once.
+
+    Windows wait in memory only until their last frame has been read, so
+    memory stays bounded by the window overlap and the shuffle buffer.
+    Samples are staged in `<staging_dir>/<session>-00000.tar` for
+    DatasetExporter to mix with the other sessions of the run. Runs in a
+    worker process; returns the session's manifest entry.
+    """
+    start_time = time.perf_counter()
+    reader = SessionReader(session_path)
+    session_id = reader.session_path.name
+    config = reader.config
+    labels = {field: str(config.get(field) or "") for field in LABEL_FIELDS}
+
+    imu_ids = spec["imu_ids"] or sorted(reader.imu_files)
+    missing = [i for i in imu_ids if i not in reader.imu_files]
+    if missing or not imu_ids:
+        return {"session": session_id, "skipped": f"missing IMUs {missing}", "shards": []}
+
+    imu = {i: reader.read_imu(i)[:2] for i in imu_ids}
+    t_begin = max(ts[0] for ts, _ in imu.values())
+    t_end = min(ts[-1] for ts, _ in imu.values())
+    window_starts = np.arange(t_begin, t_end - spec["window_s"] + 1e-9, spec["stride_s"])
+    imu_grid = np.arange(int(round(spec["window_s"] * settings.SAMPLING_RATE))) / settings.SAMPLING_RATE
+
+    # Work out which frame each window slot needs before reading any frame
+    frames_per_window = spec["frames_per_window"]
+    slot_offsets = (np.arange(frames_per_window) + 0.5) * spec["window_s"] / frames_per_window
+    streams = {}
+    if spec["include_depth"]:
+        streams["depth"] = np.array([ts for _, ts, _ in reader.depth_frames])
+    if spec["include_rgb"]:
+        streams["rgb"] = np.array([ts for _, ts in reader.rgb_frames])
+    # A stream the session did not record is left out rather than
+    # invalidating every window (e.g. IMU-only sessions)
+    missing_streams = [stream for stream, frame_times in streams.items() if len(frame_times) < 2]
+    for stream in missing_streams:
+        del streams[stream]
+
+    valid = np.ones(len(window_starts), dtype=bool)
+    slot_frames = {}
+    for stream, frame_times in streams.items():
+        targets = window_starts[:, None] + slot_offsets[None, :]
+        # Allow a frame to be up to two frame periods from its slot
+        tolerance = 2 * np.median(np.diff(frame_times))
+        slot_frames[stream] = _nearest_frames(frame_times, targets.ravel(), tolerance).reshape(targets.shape)
+        valid &= (slot_frames[stream] >= 0).all(axis=1)
+
+    needed = {stream: {} for stream in streams}
+    for stream, frames in slot_frames.items():
+        for w in np.flatnonzero(valid):
+            for k, frame_index in enumerate(frames[w]):
+                needed[stream].setdefault(int(frame_index), []).append((int(w), k))
+
+    rng = np.random.default_rng(spec["seed"] + zlib.crc32(session_id.encode()))
+    # A single unbounded staging file per session
+    writer = ShardWriter(Path(staging_dir), session_id, "tar", float("inf"))
+    buffer = []
+
+    def emit(w, frames):
+        sample = {
+            "key": f"{session_id}_{w:06d}",
+            "session_id": session_id,
+            "t_start": float(window_starts[w]),
+            **labels,
+            "imu": np.stack([
+                np.stack([np.interp(window_starts[w] + imu_grid, ts, values[:, c])
+                          for c in range(values.shape[1])], axis=1)
+                for ts, values in imu.values()
+            ]).astype(np.float32),
+        }
+        for key, slots in frames.items():
+            sample[key] = np.stack(slots)
+        # Streaming shuffle: emit a random buffered sample once the buffer is full
+        buffer.append(sample)
+        if len(buffer) >= spec["shuffle_buffer"]:
+            i = rng.integers(len(buffer))
+            buffer[i], buffer[-1] = buffer[-1], buffer[i]
+            writer.add(buffer.pop())
+
+    pending = {}
+    remaining = {}
+    # Windows dropped because a depth frame was saved without IR planes
+    # (the governor's drop_ir degradation)
+    windows_without_ir = set()
+    slots_per_window = frames_per_window * len(streams)
+    for w in np.flatnonzero(valid):
+        if slots_per_window == 0:
+            emit(int(w), {})
+        else:
+            remaining[int(w)] = slots_per_window
+
+    # Read the needed frames of all streams in time order, each exactly once
+    events = sorted(
+        (streams[stream][frame_index], stream, frame_index)
+        for stream in needed for frame_index in needed[stream]
+    )
+    capture = cv2.VideoCapture(str(reader.rgb_path)) if needed.get("rgb") else None
+    video_position = 0
+    try:
+        for _, stream, frame_index in events:
+            arrays = {}
+            if stream == "depth":
+                with np.load(reader.depth_frames[frame_index][2]) as npz:
+                    arrays["depth"] = npz["depth"]
+                    if spec["include_ir"] and "ir_left" in npz.files:
+                        arrays["ir_left"] = npz["ir_left"]
+                        arrays["ir_right"] = npz["ir_right"]
+                    elif spec["include_ir"]:
+                        for w, _ in needed[stream][frame_index]:
+                            windows_without_ir.add(w)
+                            pending.pop(w, None)
+                            remaining.pop(w, None)
+                        continue
+            else:
+                while video_position < frame_index:
+                    capture.grab()
+                    video_position += 1
+                ok, frame = capture.read()
+                video_position += 1
+                if not ok:
+                    raise IOError(f"Could not decode RGB frame {frame_index} of {session_id}")
+                arrays["rgb"] = frame
+
+            for w, k in needed[stream][frame_index]:
+                if w in windows_without_ir:
+                    continue
+                window_frames = pending.setdefault(w, {})
+                for key, array in arrays.items():
+                    window_frames.setdefault(key, [None] * frames_per_window)[k] = array
+                remaining[w] -= 1
+                if remaining[w] == 0:
+                    emit(w, pending.pop(w))
+    finally:
+        if capture is not None:
+            capture.release()
+
+    rng.shuffle(buffer)
+    for sample in buffer:
+        writer.add(sample)
+    shards = writer.close()
+    entry = {
+        "session": session_id,
+        "path": str(session_path),
+        "samples": sum(s["samples"] for s in shards),
+        "windows_dropped": int((~valid).sum()) + len(windows_without_ir),
+        "windows_without_ir": len(windows_without_ir),
+        "missing_streams": missing_streams,
+        "staged": str(Path(staging_dir) / shards[0]["file"]) if shards else None,
+        "exported_at": datetime.now().isoformat(),
+        "export_time_s": time.perf_counter() - start_time,
+    }
+    if not shards:
+        # Left out of the manifest so a later incremental export retries it
+        entry["skipped"] = "no valid windows"
+    return entry
+
+
+class DatasetExporter:
+    """Exports recorded sessions as a sharded training dataset.
+
+    Sessions are spread over a process pool, one session per task, each
+    staging its shuffled samples. The staged sessions of one run are then
+    interleaved through a shared shuffle buffer into `run<n>-*` shards,
+    so every shard mixes sessions and participants. The manifest records
+    which sessions have been exported with which spec; re-running with
+    new sessions only adds a new run's shards.
+    """
+
+    def __init__(self, output_dir, spec: dict = None):
+        self.output_dir = Path(output_dir)
+        self.spec = {**DEFAULT_SPEC, **(spec or {})}
+        if self.spec["format"] not in SHARD_FORMATS:
+            raise ValueError(f"Unknown shard format: {self.spec['format']}")
+        if self.spec["format"] == "arrow" and importlib.util.find_spec("pyarrow") is None:
+            raise ValueError("The arrow shard format needs the optional pyarrow package "
+                             "(pip install -r requirements-optional.txt)")
+        self.manifest_path = self.output_dir / "manifest.json"
+        self.manifest = self._load_manifest()
+        self.progress = {"total": 0, "done": 0, "running": False}
+
+    @property
+    def staging_dir(self):
+        return self.output_dir / ".staging"
+
+    def _load_manifest(self):
+        if not self.manifest_path.exists():
+            return {"spec": self.spec, "spec_hash": spec_hash(self.spec), "runs": 0,
+                    "sessions": {}, "shards": []}
+        with open(self.manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest["spec_hash"] != spec_hash(self.spec):
+            raise ValueError(f"{self.output_dir} was exported with a different spec; "
+                             f"use a new output directory")
+        return manifest
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=4)
+        tmp_path.replace(self.manifest_path)
+
+    def export(self, session_paths, workers: int = None):
+        """Export the sessions not already in the manifest"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Left over from an interrupted run, whose sessions are redone now
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.staging_dir.mkdir()
+        todo = [str(p) for p in session_paths if Path(p).name not in self.manifest["sessions"]]
+        self.progress = {"total": len(todo), "done": 0, "running": True}
+        workers = workers or settings.EXPORT_WORKERS or None
+
+        try:
+            staged = []
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                futures = {pool.submit(export_session, p, str(self.staging_dir), self.spec): p for p in todo}
+                for future in as_completed(futures):
+                    try:
+                        entry = future.result()
+                    except Exception as e:
+                        logger.error(f"Error exporting {futures[future]}: {e}")
+                        entry = {"session": Path(futures[future]).name, "error": str(e)}
+                    self.progress["done"] += 1
+                    if "error" in entry or "skipped" in entry:
+                        self.progress.setdefault("failed", []).append(entry)
+                        continue
+                    staged.append(entry)
+                    logger.info(f"Staged {entry['session']}: {entry['samples']} samples")
+
+            if staged:
+                self.progress["mixing"] = True
+                self._mix(staged)
+        finally:
+            self.progress["running"] = False
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+        return self.manifest
+
+    def _mix(self, entries: list):
+        """Interleave the staged sessions of this run into shared shards.
+
+        The next sample is drawn from a session chosen with probability
+        proportional to its remaining samples, then passes through the
+        shuffle buffer, so only the buffer and one open file per session
+        are held at a time.
+        """
+        run = self.manifest.get("runs", 0)
+        rng = np.random.default_rng(self.spec["seed"] + run)
+        writer = ShardWriter(self.output_dir, f"run{run:04d}", self.spec["format"],
+                             int(self.spec["shard_max_mb"] * 1024 * 1024))
+        readers = [read_staged(Path(entry["staged"])) for entry in entries]
+        remaining = np.array([entry["samples"] for entry in entries], dtype=np.int64)
+        buffer = []
+        while remaining.sum() > 0:
+            i = rng.choice(len(readers), p=remaining / remaining.sum())
+            remaining[i] -= 1
+            buffer.append(next(readers[i]))
+            if len(buffer) >= self.spec["shuffle_buffer"]:
+                j = rng.integers(len(buffer))
+                buffer[j], buffer[-1] = buffer[-1], buffer[j]
+                writer.add(buffer.pop())
+        rng.shuffle(buffer)
+        for sample in buffer:
+            writer.add(sample)
+        shards = writer.close()
+
+        # The run lands in the manifest as a whole, after its shards exist
+        for entry in entries:
+            del entry["staged"]
+            entry["run"] = run
+            self.manifest["sessions"][entry["session"]] = entry
+        self.manifest["shards"].extend({**shard, "run": run} for shard in shards)
+        self.manifest["runs"] = run + 1
+        self._save_manifest()
+        logger.info(f"Export run {run}: {len(entries)} sessions mixed into {len(shards)} shards")
+
+
+def select_sessions(sessions_dir: Path, names=None, participant_ids=None):
+    """Session directories matching the given names and/or participant ids"""
+    selected = []
+    for path in sorted(Path(sessions_dir).iterdir()):
+        if not path.is_dir() or (names and path.name not in names):
+            continue
+        if participant_ids:
+            config_path = path / "config.json"
+            if not config_path.exists():
+                continue
+            with open(config_path, "r") as f:
+                if json.load(f).get("participant_id") not in participant_ids:
+                    continue
+        selected.append(path)
+    return selected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export recorded sessions as training shards")
+    parser.add_argument("output_dir")
+    parser.add_argument("--sessions", nargs="*", help="Session directory names (default: all)")
+    parser.add_argument("--participants", nargs="*", help="Only sessions of these participants")
+    parser.add_argument("--spec", help="JSON file overriding the default window/shard spec")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    spec = {}
+    if args.spec:
+        with open(args.spec, "r") as f:
+            spec = json.load(f)
+    exporter = DatasetExporter(args.output_dir, spec)
+    manifest = exporter.export(
+        select_sessions(settings.SESSIONS_DIR, args.sessions, args.participants), args.workers
+    )
+    print(f"{len(manifest['sessions'])} sessions, {len(manifest['shards'])} shards in {args.output_dir}")
@@ -0,0 +1,268 @@
+# app/services/fake_camera.py
+"""Stand-in for the subset of pyrealsense2 used by CameraService.
+
+Select it with CAMERA_BACKEND=fake to run and benchmark the recording
+pipeline without a RealSense camera attached. FAKE_CAMERA_COUNT devices
+are emulated (serials FAKE00000001, FAKE00000002, ...); frames are
+synthetic and paced at the configured fps. Each device has its own
+hardware clock, and slaves (inter_cam_sync_mode 2) are phase-locked to
+a streaming master like genlocked D4xx cameras.
+"""
+import random
+import threading
+import time
+import numpy as np
+from app.core.config import settings
+
+# Emulated USB enumeration + sensor start-up cost of pipeline.start()
+START_DELAY_S = 0.5
+
+
+class stream:
+    color = "color"
+    depth = "depth"
+    infrared = "infrared"
+
+
+class format:
+    bgr8 = "bgr8"
+    rgb8 = "rgb8"
+    y8 = "y8"
+    z16 = "z16"
+
+
+class camera_info:
+    name = "name"
+    serial_number = "serial_number"
+
+
+class option:
+    inter_cam_sync_mode = "inter_cam_sync_mode"
+    global_time_enabled = "global_time_enabled"
+
+
+class frame_metadata_value:
+    frame_counter = "frame_counter"
+    sensor_timestamp = "sensor_timestamp"
+
+
+class timestamp_domain:
+    # Same text as str() of the pyrealsense2 enum values
+    hardware_clock = "timestamp_domain.hardware_clock"
+    system_time = "timestamp_domain.system_time"
+    global_time = "timestamp_domain.global_time"
+
+
+class _Sensor:
+    def __init__(self):
+        self._options = {option.inter_cam_sync_mode: 0.0, option.global_time_enabled: 0.0}
+
+    def supports(self, opt):
+        return opt in self._options
+
+    def get_option(self, opt):
+        return self._options[opt]
+
+    def set_option(self, opt, value):
+        if opt not in self._options:
+            raise RuntimeError(f"Option {opt} is not supported by this sensor")
+        self._options[opt] = float(value)
+
+
+class _Device:
+    def __init__(self, serial: str):
+        self.serial = serial
+        self.sensor = _Sensor()
+        self.busy = False
+        # Hardware clocks start at an arbitrary point, like after power-up
+        self.clock_offset = random.uniform(1e3, 1e6)
+
+    def get_info(self, info):
+        if info == camera_info.serial_number:
+            return self.serial
+        if info == camera_info.name:
+            return "Fake RealSense D455"
+        raise RuntimeError(f"Camera info {info} is not supported")
+
+    def first_depth_sensor(self):
+        return self.sensor
+
+    @property
+    def sync_mode(self):
+        return int(self.sensor.get_option(option.inter_cam_sync_mode))
+
+    @property
+    def global_time(self):
+        return bool(self.sensor.get_option(option.global_time_enabled))
+
+
+_devices = [_Device(f"FAKE{i + 1:08d}") for i in range(settings.FAKE_CAMERA_COUNT)]
+_devices_lock = threading.Lock()
+# Frame phase of the streaming master, followed by slave devices
+_master_clock = {}
+
+
+class context:
+    def query_devices(self):
+        return list(_devices)
+
+
+class config:
+    def __init__(self):
+        self.streams = {}
+        self.serial = None
+
+    def enable_device(self, serial: str):
+        self.serial = serial
+
+    def enable_stream(self, stream_type, *args):
+        # Mirrors enable_stream(type, [index,] width, height, format, fps)
+        if len(args) == 5:
+            index, width, height, fmt, fps = args
+        else:
+            index = 0
+            width, height, fmt, fps = args
+        self.streams[(stream_type, index)] = (width, height, fmt, fps)
+
+
+class _Frame:
+    def __init__(self, data, frame_number, timestamp_ms, domain, sensor_timestamp_us):
+        self._data = data
+        self._frame_number = frame_number
+        self._timestamp_ms = timestamp_ms
+        self._domain = domain
+        self._metadata = {
+            frame_metadata_value.frame_counter: frame_number,
+            frame_metadata_value.sensor_timestamp: sensor_timestamp_us,
+        }
+
+    def get_data(self):
+        return self._data
+
+    def get_frame_number(self):
+        return self._frame_number
+
+    def get_timestamp(self):
+        return self._timestamp_ms
+
+    def get_frame_timestamp_domain(self):
+        return self._domain
+
+    def supports_frame_metadata(self, value):
+        return value in self._metadata
+
+    def get_frame_metadata(self, value):
+        return self._metadata[value]
+
+    def __bool__(self):
+        return True
+
+
+class _FrameSet(_Frame):
+    def __init__(self, frame_number, timestamp_ms, domain, sensor_timestamp_us, frames):
+        super().__init__(None, frame_number, timestamp_ms, domain, sensor_timestamp_us)
+        self._frames = frames
+
+    def get_color_frame(self):
+        return self._frames.get((stream.color, 0))
+
+    def get_depth_frame(self):
+        return self._frames.get((stream.depth, 0))
+
+    def get_infrared_frame(self, index=0):
+        return self._frames.get((stream.infrared, index))
+
+
+class pipeline:
+    def __init__(self):
+        self._config = None
+        self._device = None
+        self._base = {}
+        self._frame_number = 0
+        self._next_frame_time = None
+        self._period = 1.0 / 30
+
+    def _claim_device(self, serial):
+        with _devices_lock:
+            for device in _devices:
+                if serial and device.serial != serial:
+                    continue
+                if device.busy:
+                    if serial:
+                        raise RuntimeError(f"Device {serial} is busy")
+                    continue
+                device.busy = True
+                return device
+        raise RuntimeError(f"No device connected{f' with serial {serial}' if serial else ''}")
+
+    def start(self, cfg=None):
+        self._config = cfg or config()
+        self._device = self._claim_device(self._config.serial)
+        self._period = 1.0
+        time.sleep(START_DELAY_S)
+        for key, (width, height, fmt, fps) in self._config.streams.items():
+            # Framesets arrive at the rate of the fastest stream
+            self._period = min(self._period, 1.0 / fps)
+            gradient = np.linspace(0, 1, width, dtype=np.float32)[None, :].repeat(height, axis=0)
+            if fmt == format.z16:
+                self._base[key] = (gradient * 4000 + 500).astype(np.uint16)
+            elif fmt == format.y8:
+                self._base[key] = (gradient * 255).astype(np.uint8)
+            else:
+                self._base[key] = np.dstack([(gradient * 255).astype(np.uint8)] * 3)
+
+        self._next_frame_time = time.monotonic()
+        if self._device.sync_mode == 1:
+            _master_clock["phase"] = self._next_frame_time
+        elif self._device.sync_mode == 2 and "phase" in _master_clock:
+            # Slaves trigger on the master's frame edges
+            elapsed = self._next_frame_time - _master_clock["phase"]
+            self._next_frame_time = _master_clock["phase"] + -(-elapsed // self._period) * self._period
+        return self
+
+    def stop(self):
+        if self._device:
+            if self._device.sync_mode == 1:
+                _master_clock.pop("phase", None)
+            with _devices_lock:
+                self._device.busy = False
+        self._config = None
+        self._device = None
+
+    def _frameset(self, frame_time):
+        self._frame_number += 1
+        shift = self._frame_number % 64
+        sensor_timestamp_us = int((frame_time + self._device.clock_offset) * 1e6)
+        if self._device.global_time:
+            # Hardware time translated to the host clock
+            timestamp_ms = (time.time() - (time.monotonic() - frame_time)) * 1000
+            domain = timestamp_domain.global_time
+        else:
+            timestamp_ms = sensor_timestamp_us / 1000
+            domain = timestamp_domain.hardware_clock
+        frames = {
+            key: _Frame(np.roll(base, shift, axis=1), self._frame_number, timestamp_ms,
+                        domain, sensor_timestamp_us)
+            for key, base in self._base.items()
+        }
+        return _FrameSet(self._frame_number, timestamp_ms, domain, sensor_timestamp_us, frames)
+
+    def wait_for_frames(self, timeout_ms: int = 5000):
+        if self._config is None:
+            raise RuntimeError("wait_for_frames cannot be called before start()")
+        now = time.monotonic()
+        if self._next_frame_time > now:
+            time.sleep(self._next_frame_time - now)
+        else:
+            # Frames the caller was too slow to collect are skipped
+            missed = int((now - self._next_frame_time) / self._period)
+            self._frame_number += missed
+            self._next_frame_time += missed * self._period
+        frame_time = self._next_frame_time
+        self._next_frame_time += self._period
+        return self._frameset(frame_time)
+
+    def poll_for_frames(self):
+        if self._config is None or time.monotonic() < self._next_frame_time:
+            return None
+        return self.wait_for_frames()
@@ -2,10 +2,11 @@
 import asyncio
 import logging
 import struct
+import time
 from datetime import datetime
 from pathlib import Path
-from bleak import BleakClient, BleakScanner
 import csv
+from app.core.lazy import LazyModule
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,8 +16,12 @@ logger = logging.getLogger(__name__)
 MEASUREMENT_UUID = "15172004-4947-11e9-8646-d663bd873d93"
 CONTROL_UUID = "15172001-4947-11e9-8646-d663bd873d93"
 
+# Imported on first use so the server starts without a BLE stack
+bleak = LazyModule("bleak")
+
 class IMUDevice:
-    def __init__(self, imu_id: str, address: str, output_dir: Path, status_callback=None):
+    def __init__(self, imu_id: str, address: str, output_dir: Path, status_callback=None,
+                 device_pool=None):
         self.imu_id = imu_id
         self.address = address
         self.output_dir = Path(output_dir)
@@ -26,35 +31,45 @@ class IMUDevice:
         self.sample_count = 0
         self.is_recording = False
         self.status_callback = status_callback
+        self.device_pool = device_pool
+        self.timings = {}
+        self._record_start = None
 
     async def connect(self):
         try:
-            logger.info(f"Scanning for IMU {self.imu_id} at {self.address}...")
-            
-            # Send initial scanning status
-            if self.status_callback:
-                await self.status_callback({
-                    "imu_id": self.imu_id,
-                    "status": "scanning",
-                    "message": "Scanning for device..."
-                })
-            
-            device = await BleakScanner.find_device_by_address(
-                self.address, timeout=20.0
-            )
-            
-            if not device:
+            connect_start = time.perf_counter()
+            if self.device_pool:
+                self.client = self.device_pool.acquire_imu(self.address)
+            self.timings = {"warm_start": self.client is not None}
+
+            if self.client is None:
+                logger.info(f"Scanning for IMU {self.imu_id} at {self.address}...")
+                
+                # Send initial scanning status
                 if self.status_callback:
                     await self.status_callback({
                         "imu_id": self.imu_id,
-                        "status": "error",
-                        "message": "Device not found"
+                        "status": "scanning",
+                        "message": "Scanning for device..."
                     })
-                raise Exception(f"Could not find IMU {self.imu_id}")
-
-            self.client = BleakClient(device)
-            await self.client.connect()
-            logger.info(f"Connected to {self.imu_id}")
+                
+                device = await bleak.BleakScanner.find_device_by_address(
+                    self.address, timeout=20.0
+                )
+                
+                if not device:
+                    if self.status_callback:
+                        await self.status_callback({
+                            "imu_id": self.imu_id,
+                            "status": "error",
+                            "message": "Device not found"
+                        })
+                    raise Exception(f"Could not find IMU {self.imu_id}")
+
+                self.client = bleak.BleakClient(device)
+                await self.client.connect()
+            self.timings["connect_s"] = time.perf_counter() - connect_start
+            logger.info(f"Connected to {self.imu_id} in {self.timings['connect_s']:.3f}s")
 
             if self.status_callback:
                 await self.status_callback({
@@ -75,6 +90,7 @@ class IMUDevice:
             ])
 
             # Enable notifications
+            self._record_start = time.perf_counter()
             await self.client.start_notify(
                 MEASUREMENT_UUID,
                 self._notification_handler
@@ -115,6 +131,8 @@ class IMUDevice:
                 0, 0, 0  # placeholder for acceleration
             ])
             self.sample_count += 1
+            if self.sample_count == 1:
+                self.timings["first_sample_s"] = time.perf_counter() - self._record_start
             
             # Send status update every 100 samples
             if self.sample_count % 100 == 0:
@@ -142,7 +160,13 @@ class IMUDevice:
     async def disconnect(self):
         try:
             if self.client and self.client.is_connected:
-                await self.client.disconnect()
+                if self.device_pool:
+                    # Stop measuring but keep the link up for the next session
+                    await self.client.stop_notify(MEASUREMENT_UUID)
+                    await self.client.write_gatt_char(CONTROL_UUID, bytearray([0x01, 0x00, 0x06]))
+                    await self.device_pool.release_imu(self.address, self.client)
+                else:
+                    await self.client.disconnect()
             if self.current_file:
                 self.current_file.close()
             self.is_recording = False
@@ -152,6 +176,7 @@ class IMUDevice:
                     "imu_id": self.imu_id,
                     "status": "disconnected",
                     "samples": self.sample_count,
+                    "timings": self.timings,
                     "message": f"Disconnected. Total samples: {self.sample_count}"
                 })
                 
@@ -166,10 +191,11 @@ class IMUDevice:
                 })
 
 class IMUManager:
-    def __init__(self, status_callback=None):
+    def __init__(self, status_callback=None, device_pool=None):
         self.devices = {}
         self.is_recording = False
         self.status_callback = status_callback
+        self.device_pool = device_pool
 
     async def start_recording(self, selected_imus, imu_configs, session_path):
         """Start recording data from selected IMUs"""
@@ -188,13 +214,15 @@ class IMUManager:
                 imu_id=imu_id,
                 address=imu_configs[imu_id]['address'],
                 output_dir=session_dir,
-                status_callback=self.status_callback
+                status_callback=self.status_callback,
+                device_pool=self.device_pool
             )
 
             success = await device.connect()
             if success:
                 self.devices[imu_id] = device
-                await asyncio.sleep(2)  # Delay between device setups
+                if not device.timings["warm_start"]:
+                    await asyncio.sleep(2)  # Delay between device setups
 
         self.is_recording = len(self.devices) > 0
         return self.is_recording
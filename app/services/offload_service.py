@@ -0,0 +1,421 @@
+# app/services/offload_service.py
+import asyncio
+import base64
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from app.core.config import settings
+from app.core.lazy import LazyModule
+
+logger = logging.getLogger(__name__)
+
+boto3 = LazyModule("boto3")
+
+# A directory target must be a mount point or carry this file, so an
+# unmounted NAS path is never silently filled on the local disk
+TARGET_MARKER = ".offload_target"
+
+# Seconds to wait before retrying an unavailable target
+TARGET_RETRY_S = 60
+
+
+class TargetUnavailable(IOError):
+    """The offload target cannot be written to right now"""
+
+
+class LocalTarget:
+    """Offload to a directory: a mounted NAS path or a local stand-in.
+
+    Files are written to `<name>.part` and renamed once their checksum
+    has been verified, so a partial file is never mistaken for a copy.
+    """
+
+    def __init__(self, root, chunk_size: int):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+
+    def describe(self):
+        return str(self.root)
+
+    def check(self):
+        """Raise TargetUnavailable unless the root is the real target"""
+        if not self.root.is_dir():
+            raise TargetUnavailable(f"Offload target {self.root} does not exist (NAS not mounted?)")
+        if not (os.path.ismount(self.root) or (self.root / TARGET_MARKER).exists()):
+            raise TargetUnavailable(f"Offload target {self.root} is not a mount point and has no "
+                                    f"{TARGET_MARKER} marker file")
+
+    def _part_path(self, key):
+        path = self.root / key
+        return path.with_name(path.name + ".part")
+
+    def open_file(self, key: str, size: int, resume: dict):
+        """Prepare to write `key`, returns the transfer state to resume from"""
+        self.check()
+        part = self._part_path(key)
+        # The root exists (checked above), so only session directories are created
+        part.parent.mkdir(parents=True, exist_ok=True)
+        offset = min(resume.get("offset", 0), part.stat().st_size if part.exists() else 0)
+        # Drop anything written after the last recorded chunk
+        with open(part, "ab") as f:
+            f.truncate(offset)
+        return {"offset": offset}
+
+    def write_chunk(self, key: str, state: dict, data: bytes):
+        with open(self._part_path(key), "r+b") as f:
+            f.seek(state["offset"])
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        state["offset"] += len(data)
+
+    def close_file(self, key: str, state: dict, sha256: str):
+        part = self._part_path(key)
+        digest = hashlib.sha256()
+        with open(part, "rb") as f:
+            for block in iter(lambda: f.read(self.chunk_size), b""):
+                digest.update(block)
+        if digest.hexdigest() != sha256:
+            part.unlink()
+            raise IOError(f"Checksum mismatch for {key}")
+        part.replace(self.root / key)
+
+    def put_bytes(self, key: str, data: bytes):
+        self.check()
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+
+class S3Target:
+    """Offload to an S3-compatible bucket using resumable multipart uploads.
+
+    Each chunk is one part and carries a Content-MD5 the server verifies.
+    """
+
+    def __init__(self, bucket: str, prefix: str, chunk_size: int, endpoint_url: str = None):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.chunk_size = chunk_size
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None)
+
+    def describe(self):
+        return f"s3://{self.bucket}/{self.prefix}"
+
+    def check(self):
+        # Bucket problems surface as errors on the first request
+        pass
+
+    def _key(self, key):
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    @staticmethod
+    def _md5(data: bytes):
+        return base64.b64encode(hashlib.md5(data).digest()).decode()
+
+    def open_file(self, key: str, size: int, resume: dict):
+        if size <= self.chunk_size:
+            # Fits in one chunk, a plain PUT is enough
+            return {"offset": 0, "single": True}
+        if resume.get("upload_id"):
+            # Trust the server's record of which parts arrived
+            response = self.client.list_parts(
+                Bucket=self.bucket, Key=self._key(key), UploadId=resume["upload_id"]
+            )
+            parts = [{"PartNumber": p["PartNumber"], "ETag": p["ETag"]}
+                     for p in response.get("Parts", [])]
+            return {"offset": len(parts) * self.chunk_size, "upload_id": resume["upload_id"],
+                    "parts": parts}
+        upload = self.client.create_multipart_upload(Bucket=self.bucket, Key=self._key(key))
+        return {"offset": 0, "upload_id": upload["UploadId"], "parts": []}
+
+    def write_chunk(self, key: str, state: dict, data: bytes):
+        if state.get("single"):
+            self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data,
+                                   ContentMD5=self._md5(data))
+        else:
+            part_number = len(state["parts"]) + 1
+            response = self.client.upload_part(
+                Bucket=self.bucket, Key=self._key(key), UploadId=state["upload_id"],
+                PartNumber=part_number, Body=data, ContentMD5=self._md5(data)
+            )
+            state["parts"].append({"PartNumber": part_number, "ETag": response["ETag"]})
+        state["offset"] += len(data)
+
+    def close_file(self, key: str, state: dict, sha256: str):
+        if not state.get("single"):
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self._key(key), UploadId=state["upload_id"],
+                MultipartUpload={"Parts": state["parts"]}
+            )
+        head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        if head["ContentLength"] != state["offset"]:
+            raise IOError(f"Size mismatch for {key}")
+
+    def put_bytes(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data,
+                               ContentMD5=self._md5(data))
+
+
+def make_target(url: str, chunk_size: int):
+    """Build a target from OFFLOAD_TARGET: a directory path or s3://bucket/prefix"""
+    if url.startswith("s3://"):
+        if importlib.util.find_spec("boto3") is None:
+            raise ValueError("s3:// offload targets need the optional boto3 package "
+                             "(pip install -r requirements-optional.txt)")
+        bucket, _, prefix = url[len("s3://"):].partition("/")
+        return S3Target(bucket, prefix, chunk_size, endpoint_url=settings.OFFLOAD_S3_ENDPOINT)
+    return LocalTarget(url, chunk_size)
+
+
+class RateLimiter:
+    """Paces transfers to an average byte rate; 0 disables the limit"""
+
+    def __init__(self, bytes_per_s: float):
+        self.bytes_per_s = bytes_per_s
+        self._next_send = time.monotonic()
+
+    async def consume(self, nbytes: int):
+        if self.bytes_per_s <= 0:
+            return
+        now = time.monotonic()
+        self._next_send = max(self._next_send, now) + nbytes / self.bytes_per_s
+        if self._next_send > now:
+            await asyncio.sleep(self._next_send - now)
+
+
+class OffloadService:
+    """Queues completed sessions and copies them to the offload target.
+
+    Progress is persisted after every chunk, so a restart resumes the
+    current file where it stopped. Transfers wait while `is_busy()` is
+    true, i.e. while a recording is active, to keep disk bandwidth for
+    the recorder.
+    """
+
+    def __init__(self, target, state_dir: Path, is_busy=None,
+                 rate_limit_mbps: float = 0, delete_after_transfer: bool = False):
+        self.target = target
+        self.state_dir = Path(state_dir)
+        self.state_path = self.state_dir / "offload_state.json"
+        self.is_busy = is_busy or (lambda: False)
+        self.rate_limiter = RateLimiter(rate_limit_mbps * 1e6)
+        self.delete_after_transfer = delete_after_transfer
+        self.paused = False
+        self.state = self._load_state()
+        self._wakeup = None
+        self._task = None
+
+    @property
+    def enabled(self):
+        return self.target is not None
+
+    def _load_state(self):
+        if self.state_path.exists():
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        return {"queue": [], "sessions": {}}
+
+    def _save_state(self):
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=4)
+        tmp_path.replace(self.state_path)
+
+    def enqueue(self, session_path):
+        """Queue a completed session directory for offload"""
+        session_path = Path(session_path)
+        if not session_path.is_dir():
+            raise FileNotFoundError(f"Session directory not found: {session_path}")
+        name = session_path.name
+        entry = self.state["sessions"].get(name)
+        if entry and entry["status"] in ("queued", "transferring", "waiting_for_target", "done"):
+            return entry
+
+        self.state["sessions"][name] = {
+            "path": str(session_path),
+            "status": "queued",
+            "file_index": 0,
+            "offset": 0,
+            "upload": {},
+            "bytes_done": 0,
+            "bytes_total": None,
+            "queued_at": datetime.now().isoformat(),
+            "completed_at": None,
+            "error": None,
+        }
+        self.state["queue"].append(name)
+        self._save_state()
+        self._notify()
+        logger.info(f"Queued session {name} for offload")
+        return self.state["sessions"][name]
+
+    def enqueue_pending(self, sessions_dir: Path):
+        """Queue every session directory not offloaded yet"""
+        if not Path(sessions_dir).is_dir():
+            return
+        for path in sorted(Path(sessions_dir).iterdir()):
+            if path.is_dir() and path.name not in self.state["sessions"]:
+                self.enqueue(path)
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+        self._notify()
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "target": self.target.describe() if self.target else None,
+            "paused": self.paused,
+            "waiting_for_recording": self.is_busy(),
+            "queue": list(self.state["queue"]),
+            "sessions": self.state["sessions"],
+        }
+
+    def start(self):
+        if self.enabled and self._task is None:
+            # Created here so it belongs to the server's running loop
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        """Transfer queued sessions one at a time, forever"""
+        logger.info(f"Offload service started, target {self.target.describe()}")
+        while True:
+            if not self.state["queue"]:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            name = self.state["queue"][0]
+            entry = self.state["sessions"][name]
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.target.check)
+                entry["error"] = None
+                await self._transfer(name, entry)
+                entry["status"] = "done"
+                entry["completed_at"] = datetime.now().isoformat()
+                if self.delete_after_transfer:
+                    shutil.rmtree(entry["path"])
+                    entry["deleted"] = True
+                logger.info(f"Offloaded session {name}")
+            except asyncio.CancelledError:
+                self._save_state()
+                raise
+            except TargetUnavailable as e:
+                # Keep the session queued, resumable, until the target comes back
+                if entry.get("error") != str(e):
+                    logger.error(f"Offload waiting for target: {e}")
+                entry["status"] = "waiting_for_target"
+                entry["error"] = str(e)
+                self._save_state()
+                await asyncio.sleep(TARGET_RETRY_S)
+                continue
+            except Exception as e:
+                logger.error(f"Error offloading session {name}: {e}")
+                entry["status"] = "error"
+                entry["error"] = str(e)
+            self.state["queue"].remove(name)
+            self._save_state()
+
+    async def _wait_until_allowed(self):
+        while self.paused or self.is_busy():
+            await asyncio.sleep(1.0)
+
+    def _manifest_path(self, name):
+        return self.state_dir / f"{name}.manifest.jsonl"
+
+    async def _transfer(self, name: str, entry: dict):
+        loop = asyncio.get_running_loop()
+        session_path = Path(entry["path"])
+        files = sorted(p for p in session_path.rglob("*") if p.is_file())
+        entry["status"] = "transferring"
+        entry["bytes_total"] = sum(p.stat().st_size for p in files)
+        chunk_size = self.target.chunk_size
+
+        while entry["file_index"] < len(files):
+            path = files[entry["file_index"]]
+            rel = path.relative_to(session_path).as_posix()
+            key = f"{name}/{rel}"
+            size = path.stat().st_size
+
+            await self._wait_until_allowed()
+            upload = await loop.run_in_executor(
+                None, self.target.open_file, key, size, {"offset": entry["offset"], **entry["upload"]}
+            )
+            # The target may have less than we recorded; rewind to what it has
+            entry["bytes_done"] -= entry["offset"] - upload["offset"]
+            digest = await loop.run_in_executor(None, self._hash_prefix, path, upload["offset"])
+
+            with open(path, "rb") as f:
+                f.seek(upload["offset"])
+                while upload["offset"] < size:
+                    await self._wait_until_allowed()
+                    data = await loop.run_in_executor(None, f.read, chunk_size)
+                    digest.update(data)
+                    await loop.run_in_executor(None, self.target.write_chunk, key, upload, data)
+                    entry["offset"] = upload["offset"]
+                    entry["upload"] = {k: v for k, v in upload.items() if k != "offset"}
+                    entry["bytes_done"] += len(data)
+                    self._save_state()
+                    await self.rate_limiter.consume(len(data))
+
+            sha256 = digest.hexdigest()
+            await loop.run_in_executor(None, self.target.close_file, key, upload, sha256)
+            with open(self._manifest_path(name), "a") as m:
+                m.write(json.dumps({"path": rel, "size": size, "sha256": sha256}) + "\n")
+            entry["file_index"] += 1
+            entry["offset"] = 0
+            entry["upload"] = {}
+            self._save_state()
+
+        # The manifest lets the receiving side verify the whole session
+        manifest = {}
+        with open(self._manifest_path(name), "r") as m:
+            for line in m:
+                record = json.loads(line)
+                manifest[record["path"]] = record
+        manifest_data = json.dumps({
+            "session": name,
+            "files": list(manifest.values()),
+            "completed_at": datetime.now().isoformat(),
+        }, indent=4).encode()
+        await loop.run_in_executor(
+            None, self.target.put_bytes, f"{name}/offload_manifest.json", manifest_data
+        )
+        self._manifest_path(name).unlink()
+
+    def _hash_prefix(self, path: Path, length: int):
+        """sha256 of the part of a file already transferred before a restart"""
+        digest = hashlib.sha256()
+        remaining = length
+        with open(path, "rb") as f:
+            while remaining > 0:
+                block = f.read(min(remaining, self.target.chunk_size))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+        return digest
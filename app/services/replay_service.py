@@ -0,0 +1,259 @@
+# app/services/replay_service.py
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from app.core.config import settings
+from app.services.camera_service import cv2
+from app.services.session_reader import SessionReader
+
+logger = logging.getLogger(__name__)
+
+# Timeline events handed from the prefetch thread to the event loop at once
+BATCH_SIZE = 32
+
+
+def _load_npz(path):
+    with np.load(path) as npz:
+        return {key: npz[key] for key in npz.files}
+
+
+class ReplayEngine:
+    """Re-emits a recorded session with its original timing.
+
+    A background thread walks the session timeline ahead of playback and
+    submits depth (npz) and RGB (mp4) decoding to worker threads, so the
+    event loop only waits on frames that are already decoded. `speed` is
+    a multiple of real time; 0 replays as fast as possible.
+
+    Status messages match the ones IMUDevice and CameraService send live,
+    with `"replay": True` added. `on_event` receives every decoded sample
+    and frame for analytics consumers.
+    """
+
+    def __init__(self, session_path, speed: float = 1.0, publish=None, on_event=None,
+                 include_camera: bool = True):
+        self.reader = SessionReader(session_path)
+        self.speed = speed
+        self.publish = publish
+        self.on_event = on_event
+        self.include_camera = include_camera
+        self.is_running = False
+        self.events_emitted = 0
+        self.imu_samples = {}
+        self.frame_count = 0
+        self.max_lag_s = 0.0
+        self._stop = threading.Event()
+        self._queue = queue.Queue(maxsize=max(1, settings.REPLAY_PREFETCH_EVENTS // BATCH_SIZE))
+        self._decoder = ThreadPoolExecutor(max_workers=settings.REPLAY_DECODE_WORKERS,
+                                           thread_name_prefix="replay-decode")
+        # The mp4 must be decoded in order, so it gets a single thread
+        self._video_decoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="replay-video")
+        self._video = None
+
+    def _read_video_frame(self):
+        if self._video is None:
+            self._video = cv2.VideoCapture(str(self.reader.rgb_path))
+        ok, frame = self._video.read()
+        return frame if ok else None
+
+    def _release_video(self):
+        if self._video is not None:
+            self._video.release()
+
+    def _prefetch(self):
+        """Walk the timeline, start decoding frames and queue event batches"""
+        batch = []
+        try:
+            for event in self.reader.timeline(self.include_camera):
+                if self._stop.is_set():
+                    return
+                if event["kind"] == "depth":
+                    event["data"] = self._decoder.submit(_load_npz, event["path"])
+                elif event["kind"] == "rgb":
+                    event["data"] = self._video_decoder.submit(self._read_video_frame)
+                batch.append(event)
+                if len(batch) >= BATCH_SIZE:
+                    self._put(batch)
+                    batch = []
+            if batch:
+                self._put(batch)
+        except Exception as e:
+            # Decoders are shut down under us when the replay is stopped
+            if not self._stop.is_set():
+                logger.error(f"Error reading session for replay: {e}")
+        finally:
+            self._put(None)
+
+    def _put(self, item):
+        while True:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                # A full queue means the consumer is not blocked waiting
+                if self._stop.is_set():
+                    return
+
+    async def run(self):
+        """Replay the whole session, returns the number of events emitted"""
+        self.is_running = True
+        loop = asyncio.get_running_loop()
+        prefetcher = threading.Thread(target=self._prefetch, name="replay-prefetch", daemon=True)
+        prefetcher.start()
+
+        t0 = None
+        wall_start = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                batch = await loop.run_in_executor(None, self._queue.get)
+                if batch is None:
+                    break
+                for event in batch:
+                    if t0 is None:
+                        t0 = event["timestamp"]
+                        wall_start = time.monotonic()
+
+                    if self.speed > 0:
+                        due = (event["timestamp"] - t0) / self.speed
+                        elapsed = time.monotonic() - wall_start
+                        if due > elapsed:
+                            await asyncio.sleep(due - elapsed)
+                        else:
+                            self.max_lag_s = max(self.max_lag_s, elapsed - due)
+
+                    if "data" in event:
+                        event["data"] = await asyncio.wrap_future(event["data"])
+                    await self._emit(event, event["timestamp"] - t0)
+                    if self._stop.is_set():
+                        break
+        finally:
+            self._stop.set()
+            self.is_running = False
+            self._decoder.shutdown(wait=False)
+            # Release the capture on its own thread, after any pending reads
+            self._video_decoder.submit(self._release_video)
+            self._video_decoder.shutdown(wait=False)
+
+        if self.publish:
+            await self.publish({
+                "type": "replay_status",
+                "status": "finished",
+                "events": self.events_emitted,
+                "max_lag_s": self.max_lag_s,
+                "wall_time_s": time.monotonic() - wall_start,
+                "replay": True
+            })
+        logger.info(f"Replay of {self.reader.session_path} finished, {self.events_emitted} events, "
+                    f"max lag {self.max_lag_s:.3f}s")
+        return self.events_emitted
+
+    async def _emit(self, event, recording_time):
+        self.events_emitted += 1
+        if self.on_event:
+            self.on_event(event)
+        if not self.publish:
+            return
+
+        if event["kind"] == "imu":
+            imu_id = event["imu_id"]
+            count = self.imu_samples.get(imu_id, 0) + 1
+            self.imu_samples[imu_id] = count
+            # Same cadence as IMUDevice: one status every 100 samples
+            if count % 100 == 0:
+                await self.publish({
+                    "imu_id": imu_id,
+                    "status": "recording",
+                    "samples": count,
+                    "message": f"Recording: {count} samples",
+                    "replay": True
+                })
+        elif event["kind"] == "rgb" or not self.reader.rgb_frames:
+            # Count camera frames once, on RGB when present, like CameraService
+            self.frame_count += 1
+            if self.frame_count % 30 == 0:
+                await self.publish({
+                    "type": "camera_status",
+                    "frame_count": self.frame_count,
+                    "streams": {"rgb": bool(self.reader.rgb_frames), "depth": bool(self.reader.depth_frames)},
+                    "recording_time": recording_time,
+                    "replay": True
+                })
+
+    def stop(self):
+        self._stop.set()
+
+
+class ReplaySession:
+    """A replay registered with the SessionManager like a live session.
+
+    Shares the live status channel interface so WebSocket clients can
+    subscribe, list and stop it the same way.
+    """
+
+    kind = "replay"
+    imu_addresses = set()
+    camera_serials = set()
+    is_starting = False
+    estimate = {"bytes_per_s": 0.0, "cpu_cores": 0.0}
+
+    def __init__(self, session_id: str, session_path, speed: float = 1.0):
+        self.session_id = session_id
+        self.session_path = session_path
+        self.speed = speed
+        self.started_at = None
+        self.is_recording = False
+        self.subscribers = set()
+        self.engine = ReplayEngine(session_path, speed=speed, publish=self.publish)
+        self._task = None
+
+    def subscribe(self, callback):
+        self.subscribers.add(callback)
+
+    def unsubscribe(self, callback):
+        self.subscribers.discard(callback)
+
+    async def publish(self, status: dict):
+        status = {**status, "session_id": self.session_id}
+        for callback in list(self.subscribers):
+            try:
+                await callback(status)
+            except Exception as e:
+                logger.error(f"Error sending replay status for {self.session_id}: {e}")
+                self.subscribers.discard(callback)
+
+    async def start(self):
+        self.started_at = datetime.now()
+        self.is_recording = True
+        self._task = asyncio.create_task(self._run())
+        return {"success": True, "message": f"Replay started at {self.speed or 'max'}x"}
+
+    async def _run(self):
+        try:
+            await self.engine.run()
+        except Exception as e:
+            logger.error(f"Replay {self.session_id} failed: {e}")
+            await self.publish({"type": "replay_status", "status": "error", "message": str(e)})
+        finally:
+            self.is_recording = False
+
+    async def stop(self):
+        self.engine.stop()
+        if self._task:
+            await self._task
+
+    def info(self):
+        return {
+            "session_id": self.session_id,
+            "session_path": str(self.session_path),
+            "kind": self.kind,
+            "speed": self.speed,
+            "is_recording": self.is_recording,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "events": self.engine.events_emitted,
+            "max_lag_s": self.engine.max_lag_s,
+        }
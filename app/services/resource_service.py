@@ -0,0 +1,206 @@
+# app/services/resource_service.py
+import logging
+import shutil
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Approximate on-disk bytes per pixel for each camera output
+# (mp4v for RGB, compressed npz planes for depth/IR)
+BYTES_PER_PIXEL = {
+    "rgb": 0.12,
+    "depth": 0.9,
+    "ir_left": 0.55,
+    "ir_right": 0.55,
+}
+
+# Approximate CPU cost (cores) per megapixel/s of each output
+CPU_CORES_PER_MPIXEL_S = {
+    "rgb": 0.035,
+    "depth": 0.030,
+    "ir_left": 0.020,
+    "ir_right": 0.020,
+}
+
+# One IMU CSV row (ISO timestamp + 7 floats) and its BLE/CSV handling cost
+IMU_BYTES_PER_SAMPLE = 110
+IMU_CPU_CORES = 0.02
+
+# Number of frames in the rolling window used to detect write pressure
+PRESSURE_WINDOW = 30
+
+
+class ResourceGovernor:
+    """Estimates the I/O and CPU budget of a recording configuration and
+    degrades camera output when storage cannot keep up.
+
+    IMU data is never degraded; only IR planes and depth frames are shed.
+    """
+
+    def __init__(self, session_path: Path = None, policy=None):
+        self.session_path = Path(session_path) if session_path else None
+        self.policy = list(policy if policy is not None else settings.DEGRADATION_POLICY)
+        self.level = 0
+        self.save_ir = True
+        self.depth_decimation = 1
+        self.frame_period = 1.0 / 30
+        self.latencies = deque(maxlen=PRESSURE_WINDOW)
+        self.backlog = deque(maxlen=PRESSURE_WINDOW)
+        self.degradations = []
+
+    def estimate(self, cameras: list, imu_count: int):
+        """Estimate bytes/s and CPU cores needed for the requested cameras.
+
+        `cameras` is a list of CameraConfig; each stream is costed at its
+        own resolution and fps, and depth implies both IR planes.
+        """
+        outputs = []
+        for camera in cameras:
+            if camera.rgb:
+                outputs.append((camera.name, "rgb", camera.rgb))
+            if camera.depth:
+                outputs.extend((camera.name, plane, camera.depth) for plane in ("depth", "ir_left", "ir_right"))
+
+        breakdown = {}
+        for camera_name, plane, stream in outputs:
+            pixels_per_s = stream.width * stream.height * stream.fps
+            breakdown[f"{camera_name}:{plane}"] = {
+                "bytes_per_s": BYTES_PER_PIXEL[plane] * pixels_per_s,
+                "cpu_cores": CPU_CORES_PER_MPIXEL_S[plane] * pixels_per_s / 1e6,
+            }
+        if imu_count:
+            breakdown["imu"] = {
+                "bytes_per_s": IMU_BYTES_PER_SAMPLE * settings.SAMPLING_RATE * imu_count,
+                "cpu_cores": IMU_CPU_CORES * imu_count,
+            }
+
+        # Writes are judged against the fastest stream's frame period
+        fps = max((stream.fps for _, _, stream in outputs), default=30)
+        self.frame_period = 1.0 / fps
+        return {
+            "bytes_per_s": sum(b["bytes_per_s"] for b in breakdown.values()),
+            "cpu_cores": sum(b["cpu_cores"] for b in breakdown.values()),
+            "breakdown": breakdown,
+        }
+
+    def admit(self, estimate: dict, committed: dict = None):
+        """Decide whether an estimated configuration fits the host budget.
+
+        `committed` is the combined estimate of sessions already recording
+        on this host, which share the same storage and CPU.
+        Returns a dict with decision "accept", "warn" or "reject" and the
+        reasons behind it.
+        """
+        reasons = []
+        decision = "accept"
+        warn_fraction = settings.RESOURCE_WARN_FRACTION
+        committed = committed or {"bytes_per_s": 0.0, "cpu_cores": 0.0}
+        total_bytes_per_s = estimate["bytes_per_s"] + committed["bytes_per_s"]
+
+        checks = [
+            ("storage bandwidth", total_bytes_per_s / 1e6,
+             settings.STORAGE_WRITE_BUDGET_MBPS, "MB/s"),
+            ("CPU", estimate["cpu_cores"] + committed["cpu_cores"],
+             settings.CPU_BUDGET_CORES, "cores"),
+        ]
+
+        if self.session_path:
+            # Walk up to an existing directory so disk_usage works before mkdir
+            probe = self.session_path
+            while not probe.exists() and probe != probe.parent:
+                probe = probe.parent
+            free_mb = shutil.disk_usage(probe).free / 1e6
+            minimum_mb = total_bytes_per_s * settings.MIN_SESSION_DURATION_S / 1e6
+            needed_mb = total_bytes_per_s * settings.MAX_SESSION_DURATION_S / 1e6
+            if minimum_mb > free_mb:
+                checks.append(("free disk space", minimum_mb, free_mb, "MB"))
+            elif needed_mb > free_mb:
+                # Short sessions still fit, so only flag the shortfall
+                if decision == "accept":
+                    decision = "warn"
+                reasons.append(f"free disk space: {free_mb:.0f} MB holds "
+                               f"{free_mb * 1e6 / total_bytes_per_s / 60:.0f} min, "
+                               f"less than the {settings.MAX_SESSION_DURATION_S / 60:.0f} min maximum session")
+
+        for name, required, available, unit in checks:
+            if required > available:
+                decision = "reject"
+                reasons.append(f"{name}: needs {required:.1f} {unit}, budget {available:.1f} {unit}")
+            elif required > available * warn_fraction:
+                if decision == "accept":
+                    decision = "warn"
+                reasons.append(f"{name}: needs {required:.1f} {unit}, "
+                               f"above {warn_fraction:.0%} of {available:.1f} {unit}")
+
+        self._log_event("admission", f"{decision}: {'; '.join(reasons) or 'within budget'}")
+        return {"decision": decision, "reasons": reasons, "estimate": estimate}
+
+    def observe_write(self, latency: float, dropped_frames: int = 0):
+        """Record one frame write and degrade if storage is falling behind.
+
+        `dropped_frames` is the number of frames the camera skipped since the
+        previous one, i.e. the backlog the writer failed to drain.
+        Returns the degradation applied, or None.
+        """
+        self.latencies.append(latency)
+        self.backlog.append(dropped_frames)
+        if len(self.latencies) < PRESSURE_WINDOW:
+            return None
+
+        mean_latency = sum(self.latencies) / len(self.latencies)
+        dropped = sum(self.backlog)
+        latency_budget = self.frame_period * settings.WRITE_LATENCY_BUDGET
+
+        if mean_latency <= latency_budget and dropped <= settings.MAX_DROPPED_FRAMES:
+            return None
+
+        reason = (f"mean write latency {mean_latency * 1000:.1f} ms "
+                  f"(budget {latency_budget * 1000:.1f} ms), "
+                  f"{dropped} frames dropped in last {PRESSURE_WINDOW}")
+        # Give the new level a full window to take effect before judging again
+        self.latencies.clear()
+        self.backlog.clear()
+        return self.degrade(reason)
+
+    def degrade(self, reason: str):
+        """Apply the next step of the degradation policy"""
+        if self.level >= len(self.policy):
+            logger.warning(f"Write pressure with no degradation steps left: {reason}")
+            return None
+
+        action = self.policy[self.level]
+        if action == "drop_ir":
+            self.save_ir = False
+        elif action.startswith("decimate_depth_"):
+            self.depth_decimation = int(action.rsplit("_", 1)[1])
+        else:
+            raise ValueError(f"Unknown degradation action: {action}")
+        self.level += 1
+
+        event = {
+            "timestamp": datetime.now().isoformat(),
+            "level": self.level,
+            "action": action,
+            "reason": reason,
+        }
+        self.degradations.append(event)
+        logger.warning(f"Degrading recording ({action}): {reason}")
+        self._log_event("degradation", f"{action}: {reason}")
+        return event
+
+    def keep_depth_frame(self, depth_index: int):
+        """Whether the given depth frame survives the current decimation"""
+        return depth_index % self.depth_decimation == 0
+
+    def _log_event(self, event: str, detail: str):
+        if not self.session_path or not self.session_path.exists():
+            return
+        log_file = self.session_path / "resource_log.txt"
+        is_new = not log_file.exists()
+        with open(log_file, "a") as f:
+            if is_new:
+                f.write("timestamp,event,detail\n")
+            f.write(f"{datetime.now().isoformat()},{event},\"{detail}\"\n")
@@ -0,0 +1,149 @@
+# app/services/session_reader.py
+import csv
+import heapq
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Columns written by IMUDevice after the timestamp
+IMU_CHANNELS = [
+    'quaternion_w', 'quaternion_x', 'quaternion_y', 'quaternion_z',
+    'accel_x', 'accel_y', 'accel_z'
+]
+
+
+class SessionReader:
+    """Indexes the files of a recorded session directory.
+
+    Understands the layout written by IMUDevice (`<imu_id>_<timestamp>.csv`)
+    and CameraService (`rgb_stream.mp4`, `rgb_timestamps.txt`,
+    `depth/frame_<n>_<timestamp>.npz`).
+    """
+
+    def __init__(self, session_path):
+        self.session_path = Path(session_path)
+        if not self.session_path.is_dir():
+            raise FileNotFoundError(f"Session directory not found: {self.session_path}")
+
+        self.imu_files = {}
+        for path in sorted(self.session_path.glob("*_*_*.csv")):
+            # IMU ids never contain underscores, the timestamp has one
+            imu_id = path.stem.rsplit("_", 2)[0]
+            self.imu_files[imu_id] = path
+
+        self.rgb_path = self.session_path / "rgb_stream.mp4"
+        self.rgb_frames = self._read_timestamps(self.session_path / "rgb_timestamps.txt")
+        self.depth_frames = self._index_depth()
+
+    @property
+    def config(self):
+        config_path = self.session_path / "config.json"
+        if not config_path.exists():
+            return {}
+        with open(config_path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _read_timestamps(path: Path):
+        """List of (frame_number, timestamp) from a *_timestamps.txt file"""
+        if not path.exists():
+            return []
+        frames = []
+        with open(path, "r") as f:
+            next(f, None)  # Header
+            for line in f:
+                frame_number, timestamp = line.strip().split(",")
+                frames.append((int(frame_number), float(timestamp)))
+        return frames
+
+    def _index_depth(self):
+        """List of (frame_number, timestamp, path) sorted by time"""
+        depth_dir = self.session_path / "depth"
+        if not depth_dir.is_dir():
+            return []
+        frames = []
+        for path in depth_dir.glob("frame_*_*.npz"):
+            _, frame_number, timestamp = path.stem.split("_")
+            frames.append((int(frame_number), float(timestamp), path))
+        frames.sort(key=lambda f: f[1])
+        return frames
+
+    def imu_samples(self, imu_id: str):
+        """Yield (timestamp, values) for every row of an IMU file"""
+        with open(self.imu_files[imu_id], "r", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Header
+            for row in reader:
+                if not row:
+                    continue
+                timestamp = datetime.fromisoformat(row[0]).timestamp()
+                yield timestamp, [float(v) for v in row[1:]]
+
+    def read_imu(self, imu_id: str):
+        """Load a whole IMU file as arrays.
+
+        Returns (timestamps, values, offsets): float64 epoch seconds, a
+        float32 (n, channels) array and the byte offset of every row, so
+        a range of rows can later be re-read with `read_imu_rows`.
+        """
+        timestamps, values, offsets = [], [], []
+        with open(self.imu_files[imu_id], "rb") as f:
+            f.readline()  # Header
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                row = line.decode().strip().split(",")
+                if len(row) < 2:
+                    continue
+                timestamps.append(datetime.fromisoformat(row[0]).timestamp())
+                values.append([float(v) for v in row[1:]])
+                offsets.append(offset)
+        return (
+            np.array(timestamps, dtype=np.float64),
+            np.array(values, dtype=np.float32).reshape(len(values), len(IMU_CHANNELS)),
+            np.array(offsets, dtype=np.int64),
+        )
+
+    def read_imu_rows(self, imu_id: str, offset: int, count: int):
+        """Read `count` rows of an IMU file starting at a byte offset"""
+        timestamps, values = [], []
+        with open(self.imu_files[imu_id], "rb") as f:
+            f.seek(offset)
+            for _ in range(count):
+                line = f.readline()
+                if not line:
+                    break
+                row = line.decode().strip().split(",")
+                timestamps.append(datetime.fromisoformat(row[0]).timestamp())
+                values.append([float(v) for v in row[1:]])
+        return timestamps, values
+
+    def _imu_events(self, imu_id: str):
+        # A function per source binds imu_id; a generator expression in a
+        # loop would see only the last one
+        for ts, values in self.imu_samples(imu_id):
+            yield {"kind": "imu", "timestamp": ts, "imu_id": imu_id, "values": values}
+
+    def timeline(self, include_camera: bool = True):
+        """Yield every recorded sample and frame in timestamp order.
+
+        Events are dicts with `kind` ("imu", "rgb" or "depth") and
+        `timestamp`; IMU rows are read lazily so long sessions stream.
+        """
+        sources = [self._imu_events(imu_id) for imu_id in self.imu_files]
+        if include_camera:
+            sources.append(
+                {"kind": "rgb", "timestamp": ts, "frame_number": n, "index": i}
+                for i, (n, ts) in enumerate(self.rgb_frames)
+            )
+            sources.append(
+                {"kind": "depth", "timestamp": ts, "frame_number": n, "path": path}
+                for n, ts, path in self.depth_frames
+            )
+        return heapq.merge(*sources, key=lambda e: e["timestamp"])
@@ -0,0 +1,398 @@
+# app/services/session_service.py
+import asyncio
+import logging
+import multiprocessing
+import queue
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+from app.core.config import settings
+from app.core.models import CameraConfig
+from app.services.imu_service import IMUManager
+from app.services.camera_service import CameraService
+from app.services.replay_service import ReplaySession
+from app.services.resource_service import ResourceGovernor
+
+logger = logging.getLogger(__name__)
+
+
+class SessionPipeline:
+    """The devices and writers of one recording session.
+
+    Owns its own IMU set, cameras and resource governors so several
+    sessions can run side by side without sharing state. Each camera gets
+    its own capture worker and governor, so one camera falling behind only
+    degrades its own output.
+    """
+
+    def __init__(self, session_path, selected_imus, imu_configs, cameras,
+                 publish=None, device_pool=None):
+        self.session_path = Path(session_path)
+        self.selected_imus = selected_imus
+        self.imu_configs = imu_configs
+        # Configs arrive as dicts when the pipeline runs in a worker process
+        self.cameras = [c if isinstance(c, CameraConfig) else CameraConfig(**c) for c in cameras]
+        self.publish = publish
+        imu_pool = device_pool if settings.WARM_IMUS else None
+        camera_pool = device_pool if settings.WARM_CAMERA else None
+        self.imu_manager = IMUManager(status_callback=publish, device_pool=imu_pool)
+        self.camera_services = [CameraService(camera, device_pool=camera_pool) for camera in self.cameras]
+        self.governors = {}
+        for camera in self.cameras:
+            governor = ResourceGovernor(self.session_path)
+            governor.estimate([camera], 0)
+            self.governors[camera.name] = governor
+
+    async def start(self):
+        """Start camera and IMU recording, returns a recording_status dict"""
+        try:
+            # Cameras start up concurrently, each then records on its own thread
+            recording = [c for c in self.camera_services if c.enabled_streams["rgb"] or c.enabled_streams["depth"]]
+            results = await asyncio.gather(*(
+                camera.initialize(session_path=self.session_path, governor=self.governors[camera.name])
+                for camera in recording
+            ))
+            for camera, camera_success in zip(recording, results):
+                if camera_success:
+                    camera.set_status_callback(self.publish)
+                    await camera.start_recording()
+
+            imu_success = await self.imu_manager.start_recording(
+                self.selected_imus,
+                self.imu_configs,
+                self.session_path
+            )
+        except Exception:
+            await self.stop()
+            raise
+
+        # Camera-only sessions (e.g. benchmarks) succeed without IMUs
+        success = imu_success or (not self.selected_imus and any(results))
+        if not success:
+            # A session reported as not recording must not leave devices
+            # recording, or stop/conflict checks would skip over them
+            await self.stop()
+        return {
+            "success": success,
+            "message": "Recording started" if success else "Failed to start recording"
+        }
+
+    def timings(self):
+        """Device start-up and time-to-first-data measurements"""
+        return {
+            "cameras": {c.name: c.timings for c in self.camera_services},
+            "imus": {imu_id: d.timings for imu_id, d in self.imu_manager.devices.items()},
+        }
+
+    async def stop(self):
+        """Stop IMU and camera recording"""
+        await self.imu_manager.stop_recording()
+        # Also releases pipelines of cameras that started but never recorded
+        await asyncio.gather(*(c.stop_recording() for c in self.camera_services if c.pipeline or c.start_time))
+
+
+def _run_pipeline_process(pipeline_kwargs: dict, status_queue, stop_event):
+    """Entry point of a session worker process.
+
+    Runs the pipeline on its own event loop and forwards every status
+    message to the parent through `status_queue`.
+    """
+    async def publish(status):
+        status_queue.put(status)
+
+    async def main():
+        pipeline = SessionPipeline(publish=publish, **pipeline_kwargs)
+        result = await pipeline.start()
+        status_queue.put({"type": "_start_result", **result})
+        if result["success"]:
+            while not stop_event.is_set():
+                await asyncio.sleep(0.2)
+            await pipeline.stop()
+
+    try:
+        asyncio.run(main())
+    except Exception as e:
+        status_queue.put({"type": "_start_result", "success": False, "message": f"Error: {e}"})
+    finally:
+        status_queue.put(None)
+
+
+class RecordingSession:
+    """A running session and its status channel.
+
+    The pipeline runs either on the server's event loop or, with
+    `use_process`, in a dedicated worker process so one rig's encoding
+    load cannot starve another rig's BLE callbacks. Warm devices from the
+    pool are only used in-process, since they are owned by the server.
+    """
+
+    kind = "recording"
+
+    def __init__(self, session_id: str, session_path, selected_imus, imu_configs,
+                 cameras: List[CameraConfig], use_process=False, estimate=None,
+                 device_pool=None):
+        self.session_id = session_id
+        self.session_path = Path(session_path)
+        self.selected_imus = list(selected_imus)
+        self.imu_addresses = {imu_configs[i]['address'] for i in selected_imus if i in imu_configs}
+        self.cameras = [c for c in cameras if c.rgb or c.depth]
+        self.camera_serials = {c.serial for c in self.cameras}
+        self.use_process = use_process
+        self.estimate = estimate
+        self.device_pool = device_pool
+        self.started_at = None
+        self.is_recording = False
+        # Set by SessionManager while devices connect, so they stay reserved
+        self.is_starting = False
+        # Called once with the session when a started recording ends
+        self.on_stopped = None
+        self.subscribers = set()
+        self._pipeline_kwargs = {
+            "session_path": str(session_path),
+            "selected_imus": list(selected_imus),
+            "imu_configs": imu_configs,
+            "cameras": [c.dict() for c in cameras],
+        }
+        self._pipeline = None
+        self._process = None
+        self._stop_event = None
+        self._status_queue = None
+        self._pump_task = None
+
+    def subscribe(self, callback):
+        """Add an async callback to this session's status channel"""
+        self.subscribers.add(callback)
+
+    def unsubscribe(self, callback):
+        self.subscribers.discard(callback)
+
+    async def publish(self, status: dict):
+        """Send a status message to every subscriber of this session"""
+        status = {**status, "session_id": self.session_id}
+        for callback in list(self.subscribers):
+            try:
+                await callback(status)
+            except Exception as e:
+                logger.error(f"Error sending status for session {self.session_id}: {e}")
+                self.subscribers.discard(callback)
+
+    async def start(self):
+        self.started_at = datetime.now()
+        if self.use_process:
+            result = await self._start_process()
+        else:
+            self._pipeline = SessionPipeline(
+                publish=self.publish, device_pool=self.device_pool, **self._pipeline_kwargs
+            )
+            result = await self._pipeline.start()
+        self.is_recording = result["success"]
+        return result
+
+    async def stop(self):
+        if self.use_process:
+            await self._stop_process()
+        elif self._pipeline:
+            await self._pipeline.stop()
+        self._mark_stopped()
+
+    def _mark_stopped(self):
+        """End the recording, notifying only on the recording -> stopped change"""
+        was_recording = self.is_recording
+        self.is_recording = False
+        if was_recording and self.on_stopped:
+            self.on_stopped(self)
+
+    async def _start_process(self):
+        ctx = multiprocessing.get_context("spawn")
+        self._status_queue = ctx.Queue()
+        self._stop_event = ctx.Event()
+        self._process = ctx.Process(
+            target=_run_pipeline_process,
+            args=(self._pipeline_kwargs, self._status_queue, self._stop_event),
+            name=f"session-{self.session_id}",
+            daemon=True
+        )
+        self._process.start()
+
+        started = asyncio.get_running_loop().create_future()
+        self._pump_task = asyncio.create_task(self._pump_status(started))
+        return await started
+
+    async def _pump_status(self, started):
+        """Relay status messages from the worker process to subscribers"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                status = await loop.run_in_executor(None, self._status_queue.get, True, 1.0)
+            except queue.Empty:
+                if self._process.is_alive():
+                    continue
+                status = None
+
+            if status is None:
+                if not started.done():
+                    started.set_result({"success": False, "message": "Session worker exited"})
+                break
+            if status.get("type") == "_start_result":
+                if not started.done():
+                    started.set_result({"success": status["success"], "message": status["message"]})
+                continue
+            await self.publish(status)
+        # Also reached when the worker process ends on its own
+        self._mark_stopped()
+
+    async def _stop_process(self):
+        if not self._process:
+            return
+        self._stop_event.set()
+        await asyncio.get_running_loop().run_in_executor(None, self._process.join, 30)
+        if self._process.is_alive():
+            logger.warning(f"Session worker {self.session_id} did not exit, terminating")
+            self._process.terminate()
+        if self._pump_task:
+            await self._pump_task
+
+    def info(self):
+        return {
+            "session_id": self.session_id,
+            "session_path": str(self.session_path),
+            "kind": self.kind,
+            "selected_imus": self.selected_imus,
+            "cameras": [c.dict() for c in self.cameras],
+            "worker_process": self.use_process,
+            "is_recording": self.is_recording,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "timings": self._pipeline.timings() if self._pipeline else None,
+        }
+
+
+class SessionManager:
+    """Creates and tracks isolated recording sessions on this host"""
+
+    def __init__(self, device_pool=None):
+        self.sessions: Dict[str, RecordingSession] = {}
+        self.device_pool = device_pool
+        # Called with each recording session after it stops
+        self.stop_listeners = []
+
+    @property
+    def active_sessions(self):
+        return [s for s in self.sessions.values() if s.is_recording]
+
+    @property
+    def reserved_sessions(self):
+        """Sessions holding devices and budget: recording or still starting"""
+        return [s for s in self.sessions.values() if s.is_recording or s.is_starting]
+
+    @property
+    def is_recording(self):
+        """Whether any live recording (not a replay) is running"""
+        return any(s.kind == "recording" for s in self.active_sessions)
+
+    def get(self, session_id: str):
+        return self.sessions.get(session_id)
+
+    def list_sessions(self):
+        return [s.info() for s in self.sessions.values()]
+
+    def _check_conflicts(self, imu_addresses, camera_serials):
+        for other in self.reserved_sessions:
+            shared = imu_addresses & other.imu_addresses
+            if shared:
+                raise ValueError(f"IMUs {sorted(shared)} are in use by session {other.session_id}")
+            shared = camera_serials & other.camera_serials
+            if shared:
+                cameras = sorted(serial or "default camera" for serial in shared)
+                raise ValueError(f"Cameras {cameras} are in use by session {other.session_id}")
+
+    async def start_session(self, session_path, selected_imus, imu_configs, cameras: List[CameraConfig],
+                            use_process=None, status_callback=None):
+        """Admit and start a new session.
+
+        Returns (session, admission, result). Raises ValueError if the
+        cameras are misconfigured or the session clashes with devices
+        already recording.
+        """
+        session_id = Path(session_path).name
+        existing = self.sessions.get(session_id)
+        if existing and (existing.is_recording or existing.is_starting):
+            raise ValueError(f"Session {session_id} is already recording")
+
+        imu_addresses = {imu_configs[i]['address'] for i in selected_imus if i in imu_configs}
+        cameras = [c for c in cameras if c.rgb or c.depth]
+        names = [c.name for c in cameras]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Camera names must be unique, got {names}")
+        camera_serials = {c.serial for c in cameras}
+        if len(camera_serials) != len(cameras):
+            raise ValueError("Each camera needs its own serial number")
+        self._check_conflicts(imu_addresses, camera_serials)
+
+        # Sessions share the host's storage and CPU, so admit against the total
+        governor = ResourceGovernor(session_path)
+        estimate = governor.estimate(cameras, len(selected_imus))
+        committed = {
+            "bytes_per_s": sum(s.estimate["bytes_per_s"] for s in self.reserved_sessions),
+            "cpu_cores": sum(s.estimate["cpu_cores"] for s in self.reserved_sessions),
+        }
+        admission = governor.admit(estimate, committed)
+        if admission["decision"] == "reject":
+            return None, admission, {
+                "success": False,
+                "message": "Rejected: " + "; ".join(admission["reasons"])
+            }
+
+        if use_process is None:
+            use_process = settings.SESSION_WORKER_PROCESSES
+        session = RecordingSession(
+            session_id, session_path, selected_imus, imu_configs, cameras,
+            use_process=use_process, estimate=estimate,
+            device_pool=self.device_pool
+        )
+        if status_callback:
+            session.subscribe(status_callback)
+        # Registered before the first await, so a concurrent start sees the
+        # devices as taken while BLE scans and connects
+        session.is_starting = True
+        session.on_stopped = self._notify_stopped
+        self.sessions[session_id] = session
+        try:
+            result = await session.start()
+        finally:
+            session.is_starting = False
+        logger.info(f"Session {session_id} start: {result['message']}")
+        return session, admission, result
+
+    async def start_replay(self, session_path, speed: float = 1.0, status_callback=None):
+        """Replay a recorded session through the live status channel"""
+        session_id = f"replay_{Path(session_path).name}"
+        existing = self.sessions.get(session_id)
+        if existing and existing.is_recording:
+            raise ValueError(f"Session {session_id} is already replaying")
+
+        session = ReplaySession(session_id, session_path, speed=speed)
+        if status_callback:
+            session.subscribe(status_callback)
+        self.sessions[session_id] = session
+        result = await session.start()
+        logger.info(f"Replay {session_id} start: {result['message']}")
+        return session, result
+
+    async def stop_session(self, session_id: str):
+        session = self.sessions.get(session_id)
+        if not session:
+            raise KeyError(session_id)
+        await session.stop()
+        logger.info(f"Session {session_id} stopped")
+        return session
+
+    async def stop_all(self):
+        for session in self.active_sessions:
+            await session.stop()
+
+    def _notify_stopped(self, session):
+        for listener in self.stop_listeners:
+            try:
+                listener(session)
+            except Exception as e:
+                logger.error(f"Error in stop listener for {session.session_id}: {e}")
@@ -0,0 +1,268 @@
+# app/services/summary_service.py
+import json
+import logging
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+from app.core.config import settings
+from app.services.camera_service import cv2
+from app.services.session_reader import SessionReader, IMU_CHANNELS
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_DIR = "summary"
+
+# Thumbnails per row of the sprite sheet; JPEG caps width at 65535 px
+THUMBS_PER_ROW = 50
+
+
+def build_pyramid(timestamps, values, base_bucket: int, factor: int):
+    """min/max/mean pyramid over IMU samples.
+
+    Level 0 groups `base_bucket` samples per bucket, each further level
+    groups `factor` buckets of the level below, down to a single bucket.
+    Returns one dict of arrays per level.
+    """
+    levels = []
+    starts = np.arange(0, len(values), base_bucket)
+    level = {
+        "t": timestamps[starts],
+        "start": starts.astype(np.int64),
+        "count": np.diff(np.append(starts, len(values))).astype(np.int32),
+        "min": np.minimum.reduceat(values, starts, axis=0),
+        "max": np.maximum.reduceat(values, starts, axis=0),
+    }
+    level["mean"] = (np.add.reduceat(values, starts, axis=0) / level["count"][:, None]).astype(np.float32)
+    levels.append(level)
+
+    while len(level["t"]) > 1:
+        prev = level
+        groups = np.arange(0, len(prev["t"]), factor)
+        count = np.add.reduceat(prev["count"], groups)
+        weighted = np.add.reduceat(prev["mean"] * prev["count"][:, None], groups, axis=0)
+        level = {
+            "t": prev["t"][groups],
+            "start": prev["start"][groups],
+            "count": count.astype(np.int32),
+            "min": np.minimum.reduceat(prev["min"], groups, axis=0),
+            "max": np.maximum.reduceat(prev["max"], groups, axis=0),
+            "mean": (weighted / count[:, None]).astype(np.float32),
+        }
+        levels.append(level)
+    return levels
+
+
+class SessionSummariser:
+    """Builds and serves the timeline overview of a recorded session.
+
+    Everything is written to `<session>/summary/`: one npz pyramid per
+    IMU, a thumbnail sprite sheet of the RGB video and a depth coverage
+    strip, indexed by `summary.json`. Queries pick the pyramid level that
+    matches the requested pixel width and only fall back to the raw CSV
+    once the window is narrower than the finest level.
+    """
+
+    def __init__(self, session_path):
+        self.reader = SessionReader(session_path)
+        self.summary_path = self.reader.session_path / SUMMARY_DIR
+
+    @property
+    def index_path(self):
+        return self.summary_path / "summary.json"
+
+    @property
+    def exists(self):
+        return self.index_path.exists()
+
+    def build(self):
+        """Build every summary for the session, returns the index"""
+        build_start = time.perf_counter()
+        self.summary_path.mkdir(exist_ok=True)
+        index = {
+            "created_at": datetime.now().isoformat(),
+            "channels": IMU_CHANNELS,
+            "imus": {},
+            "thumbnails": None,
+            "depth_coverage": None,
+        }
+
+        for imu_id in self.reader.imu_files:
+            index["imus"][imu_id] = self._build_imu(imu_id)
+        if self.reader.rgb_frames and self.reader.rgb_path.exists():
+            index["thumbnails"] = self._build_thumbnails()
+        if self.reader.depth_frames:
+            index["depth_coverage"] = self._build_depth_coverage()
+
+        index["build_time_s"] = time.perf_counter() - build_start
+        with open(self.index_path, "w") as f:
+            json.dump(index, f, indent=4)
+        logger.info(f"Built summary for {self.reader.session_path} in {index['build_time_s']:.1f}s")
+        return index
+
+    def _build_imu(self, imu_id: str):
+        timestamps, values, offsets = self.reader.read_imu(imu_id)
+        if len(timestamps) == 0:
+            return {"samples": 0, "levels": 0}
+
+        levels = build_pyramid(timestamps, values, settings.SUMMARY_BASE_BUCKET,
+                               settings.SUMMARY_LEVEL_FACTOR)
+        arrays = {"row_offsets": offsets[levels[0]["start"]]}
+        for i, level in enumerate(levels):
+            for key, array in level.items():
+                arrays[f"L{i}_{key}"] = array
+        np.savez_compressed(self.summary_path / f"imu_{imu_id}.npz", **arrays)
+        return {
+            "samples": int(len(timestamps)),
+            "start": float(timestamps[0]),
+            "end": float(timestamps[-1]),
+            "levels": len(levels),
+            "base_bucket": settings.SUMMARY_BASE_BUCKET,
+            "level_factor": settings.SUMMARY_LEVEL_FACTOR,
+        }
+
+    def _build_thumbnails(self):
+        """One downscaled RGB frame per interval, tiled into a sprite sheet"""
+        interval = settings.SUMMARY_THUMB_INTERVAL_S
+        frame_times = np.array([ts for _, ts in self.reader.rgb_frames])
+        wanted = np.arange(frame_times[0], frame_times[-1] + 1e-9, interval)
+        wanted_frames = np.unique(np.minimum(np.searchsorted(frame_times, wanted), len(frame_times) - 1))
+
+        capture = cv2.VideoCapture(str(self.reader.rgb_path))
+        thumbs, times = [], []
+        width = settings.SUMMARY_THUMB_WIDTH
+        try:
+            next_wanted = iter(wanted_frames)
+            target = next(next_wanted, None)
+            frame_index = 0
+            while target is not None:
+                # grab() skips decoding into a numpy array for unwanted frames
+                if not capture.grab():
+                    break
+                if frame_index == target:
+                    ok, frame = capture.retrieve()
+                    if ok:
+                        height = int(frame.shape[0] * width / frame.shape[1])
+                        thumbs.append(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA))
+                        times.append(float(frame_times[frame_index]))
+                    target = next(next_wanted, None)
+                frame_index += 1
+        finally:
+            capture.release()
+
+        if not thumbs:
+            return None
+        height = thumbs[0].shape[0]
+        rows = (len(thumbs) + THUMBS_PER_ROW - 1) // THUMBS_PER_ROW
+        columns = min(len(thumbs), THUMBS_PER_ROW)
+        sheet = np.zeros((rows * height, columns * width, 3), dtype=np.uint8)
+        for i, thumb in enumerate(thumbs):
+            row, column = divmod(i, THUMBS_PER_ROW)
+            sheet[row * height:(row + 1) * height, column * width:(column + 1) * width] = thumb
+        cv2.imwrite(str(self.summary_path / "thumbnails.jpg"), sheet)
+        return {
+            "interval_s": interval,
+            "width": width,
+            "height": height,
+            "per_row": THUMBS_PER_ROW,
+            "timestamps": times,
+        }
+
+    def _build_depth_coverage(self):
+        """Per-interval depth frame count and valid-pixel fraction.
+
+        Only the first frame of each interval is opened, which is enough
+        to show occlusion and out-of-range stretches.
+        """
+        interval = settings.SUMMARY_DEPTH_INTERVAL_S
+        frames = self.reader.depth_frames
+        frame_times = np.array([ts for _, ts, _ in frames])
+        bins = np.arange(frame_times[0], frame_times[-1] + interval, interval)
+        bin_of_frame = np.searchsorted(bins, frame_times, side="right") - 1
+        frame_count = np.bincount(bin_of_frame, minlength=len(bins)).astype(np.int32)
+
+        valid_fraction = np.full(len(bins), np.nan, dtype=np.float32)
+        first_in_bin = np.searchsorted(bin_of_frame, np.arange(len(bins)))
+        for b, i in enumerate(first_in_bin):
+            if i < len(frames) and bin_of_frame[i] == b:
+                with np.load(frames[i][2]) as npz:
+                    depth = npz["depth"]
+                valid_fraction[b] = np.count_nonzero(depth) / depth.size
+
+        np.savez_compressed(self.summary_path / "depth_coverage.npz",
+                            t=bins, frame_count=frame_count, valid_fraction=valid_fraction)
+        return {"interval_s": interval, "bins": int(len(bins))}
+
+    def query_imu(self, imu_id: str, start: float = None, end: float = None, width: int = 1000):
+        """Return the data to draw `imu_id` over [start, end] at `width` pixels.
+
+        Picks the coarsest pyramid level with at least `width` buckets in
+        the window; narrower windows get the raw samples.
+        """
+        pyramid = _load_summary(self.summary_path / f"imu_{imu_id}.npz")
+        n_levels = sum(1 for key in pyramid if key.endswith("_t"))
+        start = pyramid["L0_t"][0] if start is None else start
+        end = pyramid["L0_t"][-1] if end is None else end
+
+        for level in range(n_levels - 1, -1, -1):
+            t = pyramid[f"L{level}_t"]
+            i0 = max(int(np.searchsorted(t, start, side="right")) - 1, 0)
+            i1 = int(np.searchsorted(t, end, side="right"))
+            if i1 - i0 >= width:
+                return {
+                    "imu_id": imu_id,
+                    "level": level,
+                    "channels": IMU_CHANNELS,
+                    "t": t[i0:i1].tolist(),
+                    "count": pyramid[f"L{level}_count"][i0:i1].tolist(),
+                    "min": pyramid[f"L{level}_min"][i0:i1].tolist(),
+                    "max": pyramid[f"L{level}_max"][i0:i1].tolist(),
+                    "mean": pyramid[f"L{level}_mean"][i0:i1].tolist(),
+                }
+
+        # Sample-level detail: read just the rows of the covering buckets
+        t = pyramid["L0_t"]
+        i0 = max(int(np.searchsorted(t, start, side="right")) - 1, 0)
+        i1 = int(np.searchsorted(t, end, side="right"))
+        rows = int(pyramid["L0_count"][i0:i1].sum())
+        timestamps, values = self.reader.read_imu_rows(imu_id, int(pyramid["row_offsets"][i0]), rows)
+        return {
+            "imu_id": imu_id,
+            "level": "raw",
+            "channels": IMU_CHANNELS,
+            "t": timestamps,
+            "values": values,
+        }
+
+    def query_depth_coverage(self, start: float = None, end: float = None, width: int = 1000):
+        """Depth coverage over [start, end], merged down to at most `width` bins"""
+        coverage = _load_summary(self.summary_path / "depth_coverage.npz")
+        t = coverage["t"]
+        i0 = max(int(np.searchsorted(t, t[0] if start is None else start, side="right")) - 1, 0)
+        i1 = int(np.searchsorted(t, t[-1] if end is None else end, side="right"))
+        if i1 <= i0:
+            return {"t": [], "frame_count": [], "valid_fraction": []}
+        step = max(1, -(-(i1 - i0) // width))
+        groups = np.arange(i0, i1, step)
+        valid = coverage["valid_fraction"][i0:i1]
+        return {
+            "t": t[groups].tolist(),
+            "frame_count": np.add.reduceat(coverage["frame_count"][i0:i1], groups - i0).tolist(),
+            "valid_fraction": [
+                None if np.all(np.isnan(valid[g - i0:g - i0 + step])) else float(np.nanmean(valid[g - i0:g - i0 + step]))
+                for g in groups
+            ],
+        }
+
+
+def _load_summary(path: Path):
+    # Keyed on mtime so a rebuilt summary is picked up
+    return _load_npz(str(path), path.stat().st_mtime)
+
+
+@lru_cache(maxsize=32)
+def _load_npz(path: str, mtime: float):
+    # Summaries are small and only change when rebuilt, so keep them in memory
+    with np.load(path) as npz:
+        return {key: npz[key] for key in npz.files}
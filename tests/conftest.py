@@ -0,0 +1,41 @@
+import json
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+
+IMU_HEADER = "timestamp,quaternion_w,quaternion_x,quaternion_y,quaternion_z,accel_x,accel_y,accel_z\n"
+
+
+@pytest.fixture
+def make_session(tmp_path):
+    """Write a synthetic session in the layout the recorder produces.
+
+    IMUs are sampled at 60 Hz with accel_z counting samples; depth frames
+    are 4x4, every `ir_every`-th one saved with IR planes (0 for none).
+    """
+    def make(name, seconds=10.0, imu_ids=("AL",), depth_fps=0, ir_every=1,
+             start=datetime(2026, 1, 1, 9, 0, 0), participant_id="P01"):
+        session_path = tmp_path / "sessions" / name
+        session_path.mkdir(parents=True)
+        with open(session_path / "config.json", "w") as f:
+            json.dump({"session_name": name, "researcher_id": "R01",
+                       "participant_id": participant_id}, f)
+
+        for imu_id in imu_ids:
+            with open(session_path / f"{imu_id}_{start:%Y%m%d_%H%M%S}.csv", "w") as f:
+                f.write(IMU_HEADER)
+                for i in range(int(seconds * 60)):
+                    t = start + timedelta(seconds=i / 60)
+                    f.write(f"{t.isoformat()},1.0,0.0,0.0,0.0,0.0,0.0,{i}\n")
+
+        if depth_fps:
+            (session_path / "depth").mkdir()
+            for i in range(int(seconds * depth_fps)):
+                timestamp = (start + timedelta(seconds=i / depth_fps)).timestamp()
+                planes = {"depth": np.full((4, 4), i, dtype=np.uint16)}
+                if ir_every and i % ir_every == 0:
+                    planes["ir_left"] = np.zeros((4, 4), dtype=np.uint8)
+                    planes["ir_right"] = np.zeros((4, 4), dtype=np.uint8)
+                np.savez_compressed(session_path / "depth" / f"frame_{i}_{timestamp:.6f}.npz", **planes)
+        return session_path
+    return make
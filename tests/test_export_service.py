@@ -0,0 +1,82 @@
+from datetime import datetime
+import numpy as np
+import pytest
+from app.services.export_service import DEFAULT_SPEC, DatasetExporter, export_session, read_staged
+
+SPEC = {**DEFAULT_SPEC, "include_rgb": False, "shuffle_buffer": 4}
+
+
+def staged_samples(entry):
+    return list(read_staged(entry["staged"]))
+
+
+def test_export_session_windows(make_session, tmp_path):
+    # 10 s of IMU: 2 s windows every 1 s start at 0..7 s
+    session = make_session("S1", depth_fps=10)
+    entry = export_session(str(session), str(tmp_path), SPEC)
+    assert entry["samples"] == 8 and entry["windows_dropped"] == 0
+
+    samples = sorted(staged_samples(entry), key=lambda s: s["t_start"])
+    assert [s["key"] for s in samples] == [f"S1_{w:06d}" for w in range(8)]
+    assert np.diff([s["t_start"] for s in samples]) == pytest.approx(1.0)
+    assert samples[0]["participant_id"] == "P01"
+    assert samples[0]["imu"].shape == (1, 120, 7)
+    # The window's single depth frame sits at its middle, 1 s in
+    assert [int(s["depth"][0, 0, 0]) for s in samples] == [10 * (w + 1) for w in range(8)]
+    # accel_z counts samples, so the IMU window starts at 60 * w
+    assert [int(round(s["imu"][0, 0, 6])) for s in samples] == [60 * w for w in range(8)]
+
+
+def test_export_session_leaves_out_missing_streams(make_session, tmp_path):
+    session = make_session("S1")
+    entry = export_session(str(session), str(tmp_path), {**SPEC, "include_rgb": True})
+    assert sorted(entry["missing_streams"]) == ["depth", "rgb"]
+    assert entry["samples"] == 8
+    assert all("depth" not in s for s in staged_samples(entry))
+
+
+def test_export_session_drops_windows_without_ir(make_session, tmp_path):
+    # Frames 30 and 60 are the only window frames saved with IR planes
+    session = make_session("S1", depth_fps=10, ir_every=3)
+    entry = export_session(str(session), str(tmp_path), {**SPEC, "include_ir": True})
+    assert entry["samples"] == 2
+    assert entry["windows_without_ir"] == 6 and entry["windows_dropped"] == 6
+    assert sorted(int(s["depth"][0, 0, 0]) for s in staged_samples(entry)) == [30, 60]
+
+
+def test_export_session_skips_missing_imus(make_session, tmp_path):
+    session = make_session("S1")
+    entry = export_session(str(session), str(tmp_path), {**SPEC, "imu_ids": ["AL", "AR"]})
+    assert "skipped" in entry
+
+
+def test_export_is_incremental_and_mixes_sessions(make_session, tmp_path):
+    output_dir = tmp_path / "export"
+    sessions = [make_session("S1", depth_fps=10),
+                make_session("S2", depth_fps=10, participant_id="P02", start=datetime(2026, 1, 1, 10))]
+    spec = {**SPEC, "format": "npz"}
+
+    manifest = DatasetExporter(output_dir, spec).export(sessions, workers=1)
+    assert manifest["runs"] == 1
+    assert sorted(manifest["sessions"]) == ["S1", "S2"]
+    assert [s["file"] for s in manifest["shards"]] == ["run0000-00000.npz"]
+    assert manifest["shards"][0]["sessions"] == ["S1", "S2"]
+    with np.load(output_dir / "run0000-00000.npz") as npz:
+        assert sorted(npz["session_id"]) == ["S1"] * 8 + ["S2"] * 8
+        # Interleaved rather than one session after the other
+        assert len(set(npz["session_id"][:8])) == 2
+    first_shard = (output_dir / "run0000-00000.npz").read_bytes()
+
+    sessions.append(make_session("S3", depth_fps=10, start=datetime(2026, 1, 1, 11)))
+    manifest = DatasetExporter(output_dir, spec).export(sessions, workers=1)
+    assert manifest["runs"] == 2
+    assert [s["file"] for s in manifest["shards"]] == ["run0000-00000.npz", "run0001-00000.npz"]
+    assert manifest["shards"][1]["sessions"] == ["S3"]
+    assert (output_dir / "run0000-00000.npz").read_bytes() == first_shard
+    assert not (output_dir / ".staging").exists()
+
+    # Nothing new to export
+    exporter = DatasetExporter(output_dir, spec)
+    manifest = exporter.export(sessions, workers=1)
+    assert manifest["runs"] == 2 and len(manifest["shards"]) == 2
+    assert exporter.progress == {"total": 0, "done": 0, "running": False}
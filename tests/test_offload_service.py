@@ -0,0 +1,111 @@
+import asyncio
+import os
+import pytest
+from app.services import offload_service
+from app.services.offload_service import TARGET_MARKER, LocalTarget, OffloadService
+
+CHUNK_SIZE = 1024
+
+
+@pytest.fixture
+def session(tmp_path):
+    session_path = tmp_path / "sessions" / "S1"
+    (session_path / "depth").mkdir(parents=True)
+    (session_path / "config.json").write_text('{"participant_id": "P01"}')
+    (session_path / "depth" / "frame_0_0.000000.npz").write_bytes(os.urandom(64 * CHUNK_SIZE))
+    return session_path
+
+
+@pytest.fixture
+def target(tmp_path):
+    root = tmp_path / "nas"
+    root.mkdir()
+    (root / TARGET_MARKER).touch()
+    return LocalTarget(root, CHUNK_SIZE)
+
+
+async def wait_for(condition, timeout=10.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def assert_copied(session_path, root):
+    for path in session_path.rglob("*"):
+        if path.is_file():
+            copy = root / session_path.name / path.relative_to(session_path)
+            assert copy.read_bytes() == path.read_bytes()
+    assert (root / session_path.name / "offload_manifest.json").exists()
+    assert not list(root.rglob("*.part"))
+
+
+@pytest.mark.asyncio
+async def test_resumes_after_stop(tmp_path, session, target):
+    state_dir = tmp_path / "offload"
+    # Slow enough to stop part way through the depth file
+    service = OffloadService(target, state_dir, rate_limit_mbps=0.05)
+    service.start()
+    service.enqueue(session)
+    entry = service.state["sessions"]["S1"]
+    await wait_for(lambda: entry["file_index"] == 1 and entry["offset"] >= 8 * CHUNK_SIZE)
+    await service.stop()
+    stopped_at = entry["offset"]
+    assert entry["status"] == "transferring"
+
+    resumed = OffloadService(target, state_dir)
+    assert resumed.state["queue"] == ["S1"]
+    assert resumed.state["sessions"]["S1"]["offset"] >= stopped_at
+    resumed.start()
+    await wait_for(lambda: resumed.state["sessions"]["S1"]["status"] == "done")
+    await resumed.stop()
+    assert resumed.state["sessions"]["S1"]["bytes_done"] == resumed.state["sessions"]["S1"]["bytes_total"]
+    assert_copied(session, target.root)
+
+
+@pytest.mark.asyncio
+async def test_checksum_mismatch_drops_the_partial_copy(tmp_path, session, target):
+    state_dir = tmp_path / "offload"
+    service = OffloadService(target, state_dir, rate_limit_mbps=0.05)
+    service.start()
+    service.enqueue(session)
+    entry = service.state["sessions"]["S1"]
+    await wait_for(lambda: entry["file_index"] == 1 and entry["offset"] >= 8 * CHUNK_SIZE)
+    await service.stop()
+
+    # Corrupt what already reached the target while the service was down
+    part = target.root / "S1" / "depth" / "frame_0_0.000000.npz.part"
+    with open(part, "r+b") as f:
+        f.write(b"\0" * CHUNK_SIZE)
+
+    resumed = OffloadService(target, state_dir)
+    resumed.start()
+    await wait_for(lambda: resumed.state["sessions"]["S1"]["status"] == "error")
+    assert "Checksum mismatch" in resumed.state["sessions"]["S1"]["error"]
+    assert not part.exists()
+    assert not (target.root / "S1" / "depth" / "frame_0_0.000000.npz").exists()
+
+    # Re-queued, the session is copied again from the start
+    resumed.enqueue(session)
+    await wait_for(lambda: resumed.state["sessions"]["S1"]["status"] == "done")
+    await resumed.stop()
+    assert_copied(session, target.root)
+
+
+@pytest.mark.asyncio
+async def test_waits_for_an_unmounted_target(tmp_path, session, monkeypatch):
+    monkeypatch.setattr(offload_service, "TARGET_RETRY_S", 0.05)
+    root = tmp_path / "nas"
+    root.mkdir()
+    target = LocalTarget(root, CHUNK_SIZE)
+    service = OffloadService(target, tmp_path / "offload")
+    service.start()
+    service.enqueue(session)
+    entry = service.state["sessions"]["S1"]
+    await wait_for(lambda: entry["status"] == "waiting_for_target")
+    assert list(root.iterdir()) == []
+
+    (root / TARGET_MARKER).touch()
+    await wait_for(lambda: entry["status"] == "done")
+    await service.stop()
+    assert_copied(session, root)
@@ -0,0 +1,114 @@
+from collections import namedtuple
+import pytest
+from app.core.models import CameraConfig, StreamConfig
+from app.services import resource_service
+from app.services.resource_service import PRESSURE_WINDOW, ResourceGovernor
+
+DiskUsage = namedtuple("DiskUsage", "total used free")
+
+
+def slow_window(governor, latency=1.0):
+    """Feed one full window of writes; returns the last observe_write result"""
+    result = None
+    for _ in range(PRESSURE_WINDOW):
+        result = governor.observe_write(latency)
+    return result
+
+
+def test_observe_write_degrades_in_policy_order():
+    governor = ResourceGovernor()
+    assert governor.save_ir and governor.depth_decimation == 1
+
+    assert slow_window(governor)["action"] == "drop_ir"
+    assert not governor.save_ir and governor.depth_decimation == 1
+
+    assert slow_window(governor)["action"] == "decimate_depth_2"
+    assert governor.depth_decimation == 2
+    assert [governor.keep_depth_frame(i) for i in range(4)] == [True, False, True, False]
+
+    assert slow_window(governor)["action"] == "decimate_depth_4"
+    assert governor.depth_decimation == 4
+
+    # Policy exhausted: still under pressure, nothing left to shed
+    assert slow_window(governor) is None
+    assert [d["level"] for d in governor.degradations] == [1, 2, 3]
+
+
+def test_observe_write_waits_for_a_full_window():
+    governor = ResourceGovernor()
+    for _ in range(PRESSURE_WINDOW - 1):
+        assert governor.observe_write(1.0) is None
+    assert governor.observe_write(1.0)["action"] == "drop_ir"
+    # The window restarts after a degradation
+    assert governor.observe_write(1.0) is None
+
+
+def test_observe_write_degrades_on_dropped_frames():
+    governor = ResourceGovernor()
+    result = None
+    for _ in range(PRESSURE_WINDOW):
+        result = governor.observe_write(0.0, dropped_frames=1)
+    assert result["action"] == "drop_ir"
+
+
+def test_observe_write_keeps_fast_writes():
+    governor = ResourceGovernor()
+    assert slow_window(governor, latency=0.001) is None
+    assert governor.level == 0
+
+
+def camera(width, height, fps=30, depth=True):
+    stream = StreamConfig(width=width, height=height, fps=fps)
+    return CameraConfig(rgb=stream, depth=stream if depth else None)
+
+
+@pytest.fixture
+def free_disk(monkeypatch):
+    """Set the free space, in MB, that admission sees"""
+    def set_free(free_mb):
+        monkeypatch.setattr(resource_service.shutil, "disk_usage",
+                            lambda path: DiskUsage(0, 0, free_mb * 1e6))
+    set_free(1e9)
+    return set_free
+
+
+def test_admit_accepts_within_budget(tmp_path, free_disk):
+    governor = ResourceGovernor(tmp_path / "session")
+    admission = governor.admit(governor.estimate([camera(640, 480, fps=15, depth=False)], imu_count=2))
+    assert admission["decision"] == "accept"
+    assert admission["reasons"] == []
+
+
+def test_admit_rejects_over_bandwidth(tmp_path, free_disk):
+    governor = ResourceGovernor(tmp_path / "session")
+    admission = governor.admit(governor.estimate([camera(1280, 720)] * 2, imu_count=2))
+    assert admission["decision"] == "reject"
+    assert any(r.startswith("storage bandwidth") for r in admission["reasons"])
+
+
+def test_admit_counts_committed_sessions(tmp_path, free_disk):
+    governor = ResourceGovernor(tmp_path / "session")
+    estimate = governor.estimate([camera(640, 480, depth=False)], imu_count=0)
+    assert governor.admit(estimate)["decision"] == "accept"
+    committed = {"bytes_per_s": 39e6, "cpu_cores": 0.0}
+    assert governor.admit(estimate, committed)["decision"] == "reject"
+
+
+def test_admit_warns_when_disk_holds_less_than_max_session(tmp_path, free_disk):
+    governor = ResourceGovernor(tmp_path / "session")
+    estimate = governor.estimate([camera(640, 480, fps=15, depth=False)], imu_count=0)
+    mb_per_s = estimate["bytes_per_s"] / 1e6
+    free_disk(mb_per_s * resource_service.settings.MIN_SESSION_DURATION_S * 2)
+    admission = governor.admit(estimate)
+    assert admission["decision"] == "warn"
+    assert admission["reasons"][0].startswith("free disk space")
+
+
+def test_admit_rejects_when_disk_holds_less_than_min_session(tmp_path, free_disk):
+    governor = ResourceGovernor(tmp_path / "session")
+    estimate = governor.estimate([camera(640, 480, fps=15, depth=False)], imu_count=0)
+    mb_per_s = estimate["bytes_per_s"] / 1e6
+    free_disk(mb_per_s * resource_service.settings.MIN_SESSION_DURATION_S / 2)
+    admission = governor.admit(estimate)
+    assert admission["decision"] == "reject"
+    assert admission["reasons"][0].startswith("free disk space")
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from app.services.summary_service import SessionSummariser, build_pyramid
+
+ACCEL_Z = 6
+
+
+def test_build_pyramid_levels():
+    values = np.random.default_rng(0).normal(size=(1000, 7)).astype(np.float32)
+    timestamps = np.arange(1000) / 60
+    levels = build_pyramid(timestamps, values, base_bucket=4, factor=4)
+
+    assert [len(level["t"]) for level in levels] == [250, 63, 16, 4, 1]
+    for level in levels:
+        assert level["count"].sum() == 1000
+        np.testing.assert_array_equal(level["t"], timestamps[level["start"]])
+
+    # The second level's first bucket covers samples 0..15
+    np.testing.assert_allclose(levels[1]["min"][0], values[:16].min(axis=0))
+    np.testing.assert_allclose(levels[1]["max"][0], values[:16].max(axis=0))
+    np.testing.assert_allclose(levels[1]["mean"][0], values[:16].mean(axis=0), rtol=1e-5)
+    # The last bucket is short and its mean is weighted by sample count
+    assert levels[0]["count"][-1] == 4 and levels[1]["count"][-1] == 8
+    np.testing.assert_allclose(levels[-1]["mean"][0], values.mean(axis=0), atol=1e-5)
+
+
+@pytest.fixture
+def summariser(make_session):
+    # 600 samples: levels of 150, 38, 10, 3 and 1 buckets
+    summariser = SessionSummariser(make_session("S1", seconds=10.0))
+    index = summariser.build()
+    assert index["imus"]["AL"]["samples"] == 600
+    assert index["imus"]["AL"]["levels"] == 5
+    return summariser
+
+
+@pytest.mark.parametrize("width, level", [(1, 4), (3, 3), (10, 2), (30, 1), (100, 0)])
+def test_query_imu_picks_coarsest_level_with_enough_buckets(summariser, width, level):
+    result = summariser.query_imu("AL", width=width)
+    assert result["level"] == level
+    assert len(result["t"]) >= width
+    assert sum(result["count"]) == 600
+
+
+def test_query_imu_window_narrows_the_level(summariser):
+    start = summariser.query_imu("AL", width=1)["t"][0]
+    # One second is 15 level-0 buckets, too few for 30 pixels
+    result = summariser.query_imu("AL", start=start + 2.0, end=start + 3.0, width=30)
+    assert result["level"] == "raw"
+    result = summariser.query_imu("AL", start=start + 2.0, end=start + 3.0, width=10)
+    assert result["level"] == 0
+    assert result["t"][0] <= start + 2.0 and result["t"][-1] <= start + 3.0
+
+
+def test_query_imu_falls_back_to_raw_rows(summariser):
+    start = summariser.query_imu("AL", width=1)["t"][0]
+    result = summariser.query_imu("AL", start=start + 1.0, end=start + 1.5, width=1000)
+    assert result["level"] == "raw"
+    accel_z = [int(values[ACCEL_Z]) for values in result["values"]]
+    # Rows of the covering buckets, read in order from the CSV
+    assert accel_z == list(range(accel_z[0], accel_z[0] + len(accel_z)))
+    assert accel_z[0] <= 60 and accel_z[-1] >= 90
+    assert len(result["t"]) == len(result["values"])